@@ -0,0 +1,308 @@
+"""Offline benchmarks for the boss timer hot paths.
+
+Runs against a seeded SQLite database in a temporary directory and a mocked
+Discord client, so no token or network access is needed:
+
+    python bench.py
+    python bench.py --kills 10000,1000000 --channels 1,100,5000
+
+Results are printed and written to bench_output.txt.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, List, Union
+
+import main
+
+BOSS_INPUTS = ["Venatus", "lady dalia", "dalia", "ven", "clemntis", "auraq",
+               "LadyDalia", "milvay", "l", "xyz"]
+
+
+class BenchResult:
+    def __init__(self, name: str, samples: List[float], peak_bytes: int):
+        self.name = name
+        self.samples = sorted(samples)
+        self.peak_bytes = peak_bytes
+
+    def percentile(self, pct: float) -> float:
+        index = min(len(self.samples) - 1, int(len(self.samples) * pct / 100))
+        return self.samples[index]
+
+    def format(self) -> str:
+        total = sum(self.samples)
+        throughput = len(self.samples) / total if total else float("inf")
+        return (f"{self.name:<44} n={len(self.samples):<7} "
+                f"ops/s={throughput:>12.1f}  "
+                f"p50={self.percentile(50) * 1e6:>10.1f}us  "
+                f"p99={self.percentile(99) * 1e6:>10.1f}us  "
+                f"mean={statistics.fmean(self.samples) * 1e6:>10.1f}us  "
+                f"peak_mem={self.peak_bytes / 1024:>9.1f}KiB")
+
+
+# Calls traced for peak memory; tracing is slow, so it is kept out of the
+# timed samples
+MEMORY_SAMPLES = 20
+
+
+def measure(name: str, func: Callable[[], object], iterations: int) -> BenchResult:
+    """Time a synchronous callable, then trace its peak allocations"""
+    gc.collect()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    for _ in range(min(iterations, MEMORY_SAMPLES)):
+        func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return BenchResult(name, samples, peak)
+
+
+async def measure_async(name: str, func, iterations: int) -> BenchResult:
+    """Time an async callable, then trace its peak allocations"""
+    gc.collect()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    for _ in range(min(iterations, MEMORY_SAMPLES)):
+        await func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return BenchResult(name, samples, peak)
+
+
+# Concurrent kill reports in the group commit benchmark
+KILL_BURST = 100
+
+
+class FakeMessage:
+    """Stands in for discord.PartialMessage; edits take a fixed latency"""
+
+    def __init__(self, message_id: int, latency: float):
+        self.id = message_id
+        self.latency = latency
+        self.edits = 0
+
+    async def edit(self, content: str):
+        await asyncio.sleep(self.latency)
+        self.edits += 1
+
+
+def seed_kills(path: str, kills: int, guilds: int):
+    """Bulk insert synthetic kill history (the schema must already exist)"""
+    names = list(main.boss_timer.schedules)
+    now = int(time.time())
+    rng = random.Random(kills)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    batch = []
+    for i in range(kills):
+        kill_ts = now - (kills - i) * 60
+        batch.append((rng.randrange(guilds), rng.choice(names), kill_ts,
+                      kill_ts + 36000))
+        if len(batch) == 50_000:
+            conn.executemany(main.INSERT_KILL_SQL, batch)
+            batch.clear()
+    conn.executemany(main.INSERT_KILL_SQL, batch)
+    conn.commit()
+    conn.close()
+
+
+def bench_cpu(iterations: int) -> List[BenchResult]:
+    timer = main.boss_timer
+    tz = timer.timezone
+    now = datetime.now(tz)
+    state = main.GuildState(1, tz, tuple(timer.schedules), {
+        name: now + timedelta(minutes=17 * i)
+        for i, name in enumerate(timer.schedules)
+    })
+    names = list(timer.schedules)
+    kill_times = [now - timedelta(minutes=37 * i) for i in range(64)]
+    batch_names = [names[i % len(names)] for i in range(1000)]
+    batch_kills = [int(now.timestamp()) - 37 * 60 * i for i in range(1000)]
+
+    counter = iter(range(1 << 62))
+
+    def next_spawn():
+        i = next(counter)
+        timer.calculate_next_spawn(names[i % len(names)], kill_times[i % 64])
+
+    def find_name():
+        timer.find_boss_name(BOSS_INPUTS[next(counter) % len(BOSS_INPUTS)])
+
+    return [
+        measure("render_boss_table", lambda: timer.render_boss_table(state),
+                iterations),
+        measure("generate_boss_table", lambda: timer.generate_boss_table(state),
+                iterations),
+        measure("render_boss_table (compact)",
+                lambda: timer.render_boss_table(state, "compact"), iterations),
+        measure("calculate_next_spawn", next_spawn, iterations * 10),
+        measure("calculate_next_spawns (1000 kills)",
+                lambda: timer.calculate_next_spawns(batch_names, batch_kills, tz),
+                max(1, iterations // 10)),
+        measure("find_boss_name", find_name, iterations * 10),
+    ]
+
+
+async def bench_db(directory: str, kills: int, iterations: int) -> List[BenchResult]:
+    path = os.path.join(directory, f"bench_{kills}.db")
+    main.db = main.Database(path)
+    await main.init_db()
+    seed_kills(path, kills, guilds=50)
+
+    timer = main.boss_timer
+    names = list(timer.schedules)
+    counter = iter(range(1 << 62))
+
+    async def guild_load():
+        timer.guilds.clear()
+        await timer.get_guild(next(counter) % 50)
+
+    async def latest_kill():
+        i = next(counter)
+        await main.db.fetchone(main.LATEST_KILL_SQL,
+                               (i % 50, names[i % len(names)]))
+
+    state = await timer.get_guild(0)
+
+    async def record_kill():
+        i = next(counter)
+        # Distinct kill times, so no report is merged as a duplicate
+        kill_time = datetime.now(state.timezone) - timedelta(minutes=i % 10_000)
+        name = names[i % len(names)]
+        await timer.record_kill(state, name, kill_time,
+                                timer.calculate_next_spawn(name, kill_time))
+
+    async def record_kill_burst():
+        await asyncio.gather(*(record_kill() for _ in range(KILL_BURST)))
+
+    results = [
+        await measure_async(f"guild load (kills={kills})", guild_load, iterations),
+        await measure_async(f"!boss lookup (kills={kills})", latest_kill, iterations),
+        await measure_async(f"record_kill (kills={kills})", record_kill, iterations),
+        await measure_async(f"record_kill burst x{KILL_BURST} (kills={kills})",
+                            record_kill_burst, max(1, iterations // KILL_BURST)),
+    ]
+    await main.kill_writes.stop()
+    timer.guilds.clear()
+    await main.db.close()
+    return results
+
+
+async def bench_live_loop(channels: int, ticks: int, edit_latency: float) -> List[Union[BenchResult, str]]:
+    timer = main.boss_timer
+    tz = timer.timezone
+    guild_count = max(1, channels // 10)
+    for guild_id in range(guild_count):
+        now = datetime.now(tz)
+        timer.guilds[guild_id] = main.GuildState(guild_id, tz, tuple(timer.schedules), {
+            name: now + timedelta(minutes=3 * i + guild_id, seconds=30)
+            for i, name in enumerate(timer.schedules)
+        })
+    messages = {}
+    for channel_id in range(channels):
+        messages[channel_id] = FakeMessage(channel_id, edit_latency)
+        timer.live_messages[channel_id] = messages[channel_id]
+        timer.live_channels[channel_id] = channel_id % guild_count
+
+    # Measure our own overhead, not Discord's limits
+    main.live_edits.global_bucket = main.TokenBucket(1_000_000, 1.0)
+    main.LIVE_EDIT_ROUTE_RATE = (1_000_000, 1.0)
+    main.live_edits.start()
+
+    async def tick():
+        # Force every table to differ from what was last sent
+        timer.live_hashes.clear()
+        await main.update_boss_timers.coro()
+
+    async def tick_and_drain():
+        await tick()
+        while main.live_edits._pending or main.live_edits._inflight:
+            await asyncio.sleep(0.001)
+
+    results = [
+        await measure_async(f"live tick render+queue (channels={channels})", tick, ticks),
+        await measure_async(f"live tick until edits sent (channels={channels})",
+                            tick_and_drain, ticks),
+    ]
+    await main.live_edits.stop()
+    edits = sum(message.edits for message in messages.values())
+    drained = sum(results[1].samples)
+    results.append(f"  live edits sent: {edits}, "
+                   f"throughput {channels * ticks / drained:.0f} edits/s")
+
+    timer.live_messages.clear()
+    timer.live_channels.clear()
+    timer.live_hashes.clear()
+    timer.guilds.clear()
+    return results
+
+
+def parse_counts(text: str) -> List[int]:
+    return [int(part) for part in text.split(",") if part.strip()]
+
+
+async def run(args) -> List[str]:
+    lines = [f"boss timer benchmarks {datetime.now().isoformat(timespec='seconds')} "
+             f"python {sys.version.split()[0]}"]
+
+    def report(results: List[Union[BenchResult, str]]):
+        for result in results:
+            lines.append(result if isinstance(result, str) else result.format())
+            print(lines[-1], flush=True)
+
+    report(bench_cpu(args.iterations))
+    with tempfile.TemporaryDirectory() as directory:
+        for kills in parse_counts(args.kills):
+            report(await bench_db(directory, kills, args.iterations))
+    for channels in parse_counts(args.channels):
+        report(await bench_live_loop(channels, args.ticks, args.edit_latency / 1000))
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    lines.append(f"max RSS: {max_rss / 1024:.1f} MiB")
+    print(lines[-1])
+    return lines
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--kills", default="10000,100000",
+                        help="comma separated kill history sizes to seed (up to 10000000)")
+    parser.add_argument("--channels", default="1,100,1000",
+                        help="comma separated live channel counts (up to 5000)")
+    parser.add_argument("--iterations", type=int, default=1000,
+                        help="samples per micro benchmark")
+    parser.add_argument("--ticks", type=int, default=20,
+                        help="live loop ticks per channel count")
+    parser.add_argument("--edit-latency", type=float, default=5.0,
+                        help="simulated Discord edit latency in milliseconds")
+    parser.add_argument("--output", default="bench_output.txt")
+    args = parser.parse_args()
+
+    lines = asyncio.run(run(args))
+    with open(args.output, "w") as output:
+        output.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,344 @@
+"""Offline Discord stand-in and load generator for the boss timer bot.
+
+Drives the real ``bot`` object from main.py without a Discord connection:
+guilds, channels and users are created directly in discord.py's connection
+state, synthetic command messages go through ``bot.process_commands``, and
+every REST call goes through discord.py's own HTTP client to FakeDiscord, an
+in-process stand-in for its aiohttp session that applies Discord-like rate
+limits (answering 429s) and latency.
+
+    python loadtest.py
+    python loadtest.py --guilds 200 --channels-per-guild 5 --users 5000 \\
+        --commands 20000 --rate 500 --live-channels 500
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+
+import discord
+from multidict import CIMultiDict
+
+import main
+
+# (weight, command template) for the synthetic traffic
+COMMAND_MIX = [
+    (40, "!dead {boss}"),
+    (15, "!diedat {boss} {time}"),
+    (20, "!bosslist"),
+    (20, "!boss {boss}"),
+    (5, "!currenttime"),
+]
+# Discord allows about 5 messages per 5 seconds per channel
+CHANNEL_SEND_RATE = (5, 5.0)
+
+_snowflakes = itertools.count(1 << 60)
+
+MESSAGE_PATH = re.compile(r"/channels/(\d+)/messages(?:/(\d+))?$")
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def user_payload(user_id: int, bot: bool = False) -> dict:
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0",
+            "global_name": None, "avatar": None, "bot": bot}
+
+
+def message_payload(message_id: int, channel_id: int, author: dict, content: str, embeds=None) -> dict:
+    return {"id": str(message_id), "channel_id": str(channel_id), "author": author,
+            "content": content or "", "timestamp": now_iso(), "edited_timestamp": None,
+            "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+            "attachments": [], "embeds": embeds or [], "pinned": False, "type": 0}
+
+
+class FakeResponse:
+    """The parts of aiohttp.ClientResponse that discord.py reads"""
+
+    def __init__(self, status: int, data=None, headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.reason = HTTPStatus(status).phrase
+        # Discord's responses pass through Google's proxy; a 429 without Via
+        # is treated by discord.py as a Cloudflare ban
+        self.headers = CIMultiDict(headers or {}, Via="1.1 google")
+        self._text = ""
+        if data is not None:
+            self.headers["Content-Type"] = "application/json"
+            self._text = json.dumps(data)
+
+    async def text(self, encoding: str = "utf-8") -> str:
+        return self._text
+
+
+class FakeDiscord:
+    """Stands in for discord.py's aiohttp session and answers REST calls in-process
+
+    Requests still go through discord.py's HTTPClient, so its rate limit
+    handling runs as it would against Discord. Responses carry X-RateLimit
+    headers from per-channel and global buckets like Discord's. A request
+    that finds a bucket empty is answered with a 429 and its retry_after.
+    With a lockout, an over-limit route (or the whole token) then stays
+    blocked that many seconds; past main.RATE_LIMIT_MAX_WAIT_SECONDS
+    discord.py raises RateLimited instead of retrying.
+    """
+
+    closed = False
+
+    def __init__(self, bot_user: dict, latency: float, jitter: float, lockout: float = 0.0):
+        self.bot_user = bot_user
+        self.latency = latency
+        self.jitter = jitter
+        self.lockout = lockout
+        self.global_bucket = main.TokenBucket(*main.DISCORD_GLOBAL_RATE)
+        self.route_buckets: Dict[Tuple[str, str, int], main.TokenBucket] = {}
+        self.messages: Dict[int, dict] = {}
+        self.requests: Counter = Counter()
+        self.rate_limited = 0
+        self.edits = 0
+
+    def _bucket(self, method: str, path: str, channel_id: int) -> main.TokenBucket:
+        key = (method, path, channel_id)
+        bucket = self.route_buckets.get(key)
+        if bucket is None:
+            rate = main.LIVE_EDIT_ROUTE_RATE if method == "PATCH" else CHANNEL_SEND_RATE
+            bucket = self.route_buckets[key] = main.TokenBucket(*rate)
+        return bucket
+
+    def _limit(self, bucket: main.TokenBucket, scope: str) -> Optional[FakeResponse]:
+        """A 429 if the bucket is empty, else None"""
+        retry_after = bucket.delay()
+        if retry_after <= 0:
+            return None
+        if self.lockout:
+            bucket.block(self.lockout)
+            retry_after = bucket.delay()
+        self.rate_limited += 1
+        headers = {"X-RateLimit-Scope": scope, "Retry-After": str(int(retry_after) + 1)}
+        if scope == "global":
+            headers["X-RateLimit-Global"] = "true"
+        return FakeResponse(429, {"message": "You are being rate limited.",
+                                  "retry_after": retry_after, "global": scope == "global"}, headers)
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, *, data=None, **kwargs):
+        path = url[len(discord.http.Route.BASE):]
+        match = MESSAGE_PATH.match(path)
+        channel_id = int(match.group(1)) if match else 0
+        message_id = int(match.group(2)) if match and match.group(2) else None
+        if match:
+            template = "/channels/{channel_id}/messages" + ("/{message_id}" if message_id else "")
+        else:
+            template = re.sub(r"\d+", "{id}", path)
+        self.requests[(method, template)] += 1
+        await asyncio.sleep(self.latency + random.random() * self.jitter)
+
+        bucket = self._bucket(method, template, channel_id)
+        response = self._limit(bucket, "user") or self._limit(self.global_bucket, "global")
+        if response is None:
+            bucket.consume()
+            self.global_bucket.consume()
+            response = self._respond(method, channel_id, message_id,
+                                     json.loads(data) if isinstance(data, str) else {})
+            response.headers.update({
+                "X-RateLimit-Bucket": f"{method}:{template}",
+                "X-RateLimit-Limit": str(bucket.capacity),
+                "X-RateLimit-Remaining": str(max(0, int(bucket.tokens))),
+                "X-RateLimit-Reset-After": f"{(bucket.capacity - bucket.tokens) / bucket.rate:.3f}",
+            })
+        yield response
+
+    def _respond(self, method: str, channel_id: int, message_id: Optional[int], payload: dict) -> FakeResponse:
+        if message_id is None:
+            if method != "POST" or not channel_id:
+                return FakeResponse(200, {})
+            message = message_payload(next(_snowflakes), channel_id, self.bot_user,
+                                      payload.get("content"), payload.get("embeds"))
+            self.messages[int(message["id"])] = message
+            return FakeResponse(200, message)
+        message = self.messages.get(message_id)
+        if message is None:
+            return FakeResponse(404, {"message": "Unknown Message", "code": 10008})
+        if method == "DELETE":
+            del self.messages[message_id]
+            return FakeResponse(204)
+        if method == "PATCH":
+            self.edits += 1
+            message["content"] = payload.get("content", message["content"])
+            message["edited_timestamp"] = now_iso()
+        return FakeResponse(200, message)
+
+
+class SimulatedWorld:
+    """Guilds, channels and users registered in the bot's connection state"""
+
+    def __init__(self, bot: discord.Client, guilds: int, channels_per_guild: int, users: int):
+        self.state = bot._connection
+        self.channels: List[discord.TextChannel] = []
+        for _ in range(guilds):
+            guild_id = next(_snowflakes)
+            channels = [{"id": str(next(_snowflakes)), "type": 0, "name": f"bosses-{i}",
+                         "position": i, "guild_id": str(guild_id)}
+                        for i in range(channels_per_guild)]
+            guild = discord.Guild(data={"id": str(guild_id), "name": f"guild-{guild_id}",
+                                        "channels": channels, "roles": [], "members": [],
+                                        "member_count": users}, state=self.state)
+            self.state._add_guild(guild)
+            self.channels.extend(guild.text_channels)
+        self.users = [user_payload(next(_snowflakes)) for _ in range(users)]
+
+    def message(self, channel: discord.TextChannel, author: dict, content: str) -> discord.Message:
+        data = message_payload(next(_snowflakes), channel.id, author, content)
+        data["guild_id"] = str(channel.guild.id)
+        data["member"] = {"roles": [], "joined_at": now_iso(), "deaf": False, "mute": False}
+        return discord.Message(state=self.state, channel=channel, data=data)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def random_command(rng: random.Random, bosses: List[str]) -> str:
+    template = rng.choices([command for _, command in COMMAND_MIX],
+                           weights=[weight for weight, _ in COMMAND_MIX])[0]
+    return template.format(boss=rng.choice(bosses).split()[0],
+                           time=f"{rng.randrange(24):02d}:{rng.randrange(60):02d}")
+
+
+async def run(args) -> List[str]:
+    with tempfile.TemporaryDirectory() as directory:
+        return await drive(args, directory)
+
+
+async def drive(args, directory: str) -> List[str]:
+    bot = main.bot
+    bot_user = user_payload(next(_snowflakes), bot=True)
+    fake = FakeDiscord(bot_user, args.latency / 1000, args.jitter / 1000, args.lockout)
+    # Set up as HTTPClient.static_login would, which this run never calls
+    bot.http._HTTPClient__session = fake
+    bot.http._global_over = asyncio.Event()
+    bot.http._global_over.set()
+    bot._connection.user = discord.ClientUser(state=bot._connection, data=bot_user)
+    # Normally set on login; events such as command errors are scheduled on it
+    bot.loop = asyncio.get_running_loop()
+    world = SimulatedWorld(bot, args.guilds, args.channels_per_guild, args.users)
+
+    main.db = main.Database(os.path.join(directory, "loadtest.db"))
+    main.ARCHIVE_DB_PATH = os.path.join(directory, "loadtest_archive.db")
+    await bot.setup_hook()
+    await main.on_ready()
+
+    rng = random.Random(args.seed)
+    bosses = list(main.boss_timer.schedules)
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+
+    async def invoke(channel, author, content):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            await bot.process_commands(world.message(channel, author, content))
+        except Exception:
+            errors += 1
+            return
+        name = content.split()[0]
+        latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+    # Live tables first, then open-loop command traffic at the target rate
+    live_channels = world.channels[:args.live_channels]
+    await asyncio.gather(*(invoke(channel, rng.choice(world.users), "!livebosses")
+                           for channel in live_channels))
+
+    edits_before = fake.edits
+    started = time.perf_counter()
+    tasks = []
+    for i in range(args.commands):
+        due = started + i / args.rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(invoke(
+            rng.choice(world.channels), rng.choice(world.users),
+            random_command(rng, bosses))))
+    await asyncio.gather(*tasks)
+    traffic_seconds = time.perf_counter() - started
+
+    # Let the live loop catch up with the last kill reports
+    await asyncio.sleep(args.settle)
+    total_seconds = time.perf_counter() - started
+    live_edits = fake.edits - edits_before
+
+    for loop in (main.update_boss_timers, main.maintain_db, main.measure_loop_lag,
+                 main.sync_guild_changes, main.watch_roster_file):
+        loop.cancel()
+    await main.live_edits.stop()
+    await main.spawn_alerts.stop()
+    await main.kill_writes.stop()
+    await main.db.close()
+
+    lines = [
+        f"guilds={args.guilds} channels={len(world.channels)} users={args.users} "
+        f"live_channels={len(live_channels)}",
+        f"commands: {args.commands} in {traffic_seconds:.2f}s "
+        f"({args.commands / traffic_seconds:.1f}/s, target {args.rate}/s), errors={errors}",
+    ]
+    for name, samples in sorted(latencies.items()):
+        lines.append(f"  {name:<14} n={len(samples):<7} p50={percentile(samples, 50) * 1000:8.2f}ms "
+                     f"p95={percentile(samples, 95) * 1000:8.2f}ms "
+                     f"p99={percentile(samples, 99) * 1000:8.2f}ms")
+    lines.append(f"live edits: {live_edits} in {total_seconds:.2f}s "
+                 f"({live_edits / total_seconds:.1f}/s)")
+    lines.append(f"throttled commands: {main.COMMANDS_THROTTLED.value}, "
+                 f"cached !bosslist renders: {main.RENDER_CACHE_HITS.value}")
+    lines.append(f"REST requests: {sum(fake.requests.values())}, 429 responses: {fake.rate_limited}, "
+                 f"429s counted by the bot: {main.RATE_LIMIT_HITS.value}, "
+                 f"live edit errors: {main.EDIT_ERRORS.value}")
+    for (method, path), count in fake.requests.most_common():
+        lines.append(f"  {method:<6} {path:<48} {count}")
+    lines.append(f"live ticks: {main.TICK_SECONDS.count}, overruns: {main.TICK_OVERRUNS.value}, "
+                 f"mean tick {main.TICK_SECONDS.sum / max(1, main.TICK_SECONDS.count) * 1000:.2f}ms")
+    return lines
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--channels-per-guild", type=int, default=3)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--live-channels", type=int, default=20,
+                        help="channels that run !livebosses before the traffic starts")
+    parser.add_argument("--commands", type=int, default=2000,
+                        help="synthetic commands to send")
+    parser.add_argument("--rate", type=float, default=40.0,
+                        help="commands per second (open loop)")
+    parser.add_argument("--latency", type=float, default=40.0,
+                        help="simulated REST latency in milliseconds")
+    parser.add_argument("--jitter", type=float, default=20.0,
+                        help="random extra REST latency in milliseconds")
+    parser.add_argument("--settle", type=float, default=6.0,
+                        help="seconds to keep the live loop running after the traffic")
+    parser.add_argument("--lockout", type=float, default=0.0,
+                        help="seconds a route stays blocked after a 429; above "
+                             f"{main.RATE_LIMIT_MAX_WAIT_SECONDS:.0f} discord.py raises RateLimited")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for line in asyncio.run(run(args)):
+        print(line)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,133 +1,1087 @@
-from threading import Thread
-from flask import Flask
 import discord
 from discord.ext import commands, tasks
 import asyncio
+import bisect
+import calendar
+import csv
+import heapq
+import itertools
+import json
+import logging
+import math
+import sys
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 import pytz
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
 import aiosqlite
 import os
-from tabulate import tabulate
+from aiohttp import web
 from dotenv import load_dotenv
 
+try:
+    import numpy
+except ImportError:  # bulk spawn computation falls back to pure Python
+    numpy = None
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: JSON rosters only
+    tomllib = None
+
 
 load_dotenv()
 # Bot setup
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+
+
+# Sharding: SHARD_COUNT shards in total, of which this process runs
+# SHARD_IDS (comma separated). Unset, one process runs every shard.
+SHARD_COUNT = int(os.environ["SHARD_COUNT"]) if os.environ.get("SHARD_COUNT") else None
+SHARD_IDS = [int(shard_id) for shard_id in os.environ.get("SHARD_IDS", "").split(",")
+             if shard_id.strip()] or None
+# Rate limits longer than this raise discord.RateLimited instead of being
+# slept through inside discord.py, so live edits can back off per channel.
+# 30 seconds is the smallest value discord.py accepts
+RATE_LIMIT_MAX_WAIT_SECONDS = 30.0
+
+
+class BossBot(commands.AutoShardedBot):
+    async def setup_hook(self):
+        # Shards dispatch messages before on_ready, so the database has to
+        # be ready before the first one connects
+        await init_db()
+
+    async def close(self):
+        await super().close()
+        await live_edits.stop()
+        await spawn_alerts.stop()
+        await kill_writes.stop()
+        await db.close()
+
+
+bot = BossBot(command_prefix='!', intents=intents,
+              shard_count=SHARD_COUNT, shard_ids=SHARD_IDS,
+              max_ratelimit_timeout=RATE_LIMIT_MAX_WAIT_SECONDS)
 bot.remove_command('help')
 
-# Boss data
-BOSS_DATA = [
-    {"name": "Venatus", "fixed_time": "10 hrs", "armor": "TBD",
-        "level": 60, "location": "Corrupted Basin"},
-    {"name": "Viorent", "fixed_time": "10 hrs", "armor": "TBD",
-        "level": 65, "location": "Crescent Lake"},
-    {"name": "Ego", "fixed_time": "21 hrs", "armor": "TBD",
-        "level": 70, "location": "Ulan Canyon"},
-    {"name": "Clementis", "fixed_time": "Mon 11:30 / Thu 19:00",
-        "armor": "TBD", "level": 70, "location": "Corrupted Basin"},
-    {"name": "Livera", "fixed_time": "24 hrs", "armor": "TBD",
-        "level": 75, "location": "Protector's Ruins"},
-    {"name": "Araneo", "fixed_time": "24 hrs", "armor": "TBD",
-        "level": 75, "location": "Lower Tomb of Tyriosa 1F"},
-    {"name": "Undomiel", "fixed_time": "24 hrs", "armor": "TBD",
-        "level": 80, "location": "Secret Laboratory"},
-    {"name": "Saphirus", "fixed_time": "Sun 17:00 / Tue 11:30",
-        "armor": "TBD", "level": 80, "location": "Crescent Lake"},
-    {"name": "Neutro", "fixed_time": "Tue 19:00 / Thu 11:30",
-        "armor": "TBD", "level": 80, "location": "Desert of the Screaming"},
-    {"name": "Lady Dalia", "fixed_time": "18 hrs",
-        "armor": "TBD", "level": 85, "location": "Twilight Hill"},
-    {"name": "Aquleus", "fixed_time": "29 hrs", "armor": "TBD",
-        "level": 85, "location": "Lower Tomb of Tyriosa 2F"},
-    {"name": "Thymele", "fixed_time": "Mon 19:00 / Wed 11:30",
-        "armor": "TBD", "level": 85, "location": "Twilight Hill"},
-    {"name": "Amentis", "fixed_time": "29 hrs", "armor": "TBD",
-        "level": 88, "location": "Land of Glory"},
-    {"name": "Baron", "fixed_time": "32 hrs", "armor": "TBD",
-        "level": 88, "location": "Battlefield of Templar"},
-    {"name": "Milavy", "fixed_time": "Sat 15:00", "armor": "TBD",
-        "level": 90, "location": "Lower Tomb of Tyriosa 3F"},
-    {"name": "Wannitas", "fixed_time": "48 hrs", "armor": "TBD",
-        "level": 93, "location": "Plateau of Revolution"},
-    {"name": "Metus", "fixed_time": "48 hrs", "armor": "TBD",
-        "level": 93, "location": "Plateau of Revolution"},
-    {"name": "Duplican", "fixed_time": "48 hrs", "armor": "TBD",
-        "level": 93, "location": "Plateau of Revolution"},
-    {"name": "Shuliar", "fixed_time": "35 hrs", "armor": "TBD",
-        "level": 95, "location": "Ruins of the War"},
-    {"name": "Ringor", "fixed_time": "Sat 17:00", "armor": "TBD",
-        "level": 95, "location": "Battlefield of Templar"},
-    {"name": "Roderick", "fixed_time": "Fri 19:00", "armor": "TBD",
-        "level": 95, "location": "Garbana Underground Waterway 1F"},
-    {"name": "Gareth", "fixed_time": "32 hrs", "armor": "TBD",
-        "level": 98, "location": "Deadman's Land District 1"},
-    {"name": "Titore", "fixed_time": "37 hrs", "armor": "TBD",
-        "level": 98, "location": "Deadman's Land District 2"},
-    {"name": "Larba", "fixed_time": "34 hrs", "armor": "TBD",
-        "level": 98, "location": "Ruins of the War"},
-    {"name": "Catena", "fixed_time": "34 hrs", "armor": "TBD",
-        "level": 100, "location": "Deadman's Land District 3"},
-    {"name": "Auraq", "fixed_time": "Sun 21:00 / Wed 21:00", "armor": "TBD",
-        "level": 100, "location": "Garbana Underground Waterway 2F"},
-]
+
+def owns_guild(guild_id: int, channel_id: Optional[int] = None) -> bool:
+    """Whether this process runs the shard of a guild (or DM channel key)"""
+    if bot.shard_ids is None or bot.get_guild(guild_id) is not None:
+        return True
+    # DMs only arrive on shard 0; a DM's key is its own channel id
+    if guild_id == channel_id:
+        return 0 in bot.shard_ids
+    # Guilds this process cannot see: split by Discord's shard formula so
+    # exactly one process picks up their live tables and alerts
+    return (guild_id >> 22) % bot.shard_count in bot.shard_ids
+
+
+def runs_maintenance() -> bool:
+    """Whether this process maintains the shared database
+
+    Only the process running shard 0 archives and vacuums, so several
+    processes never compact the same file at once.
+    """
+    return bot.shard_ids is None or 0 in bot.shard_ids
+
+
+log = logging.getLogger("boss_timer")
+
+
+def log_event(level: int, event: str, **fields):
+    """Log an event as logfmt key=value pairs"""
+    parts = [f"event={event}"]
+    for key, value in fields.items():
+        if isinstance(value, float):
+            value = f"{value:.6f}"
+        elif not isinstance(value, int):
+            value = json.dumps(str(value))
+        parts.append(f"{key}={value}")
+    log.log(level, " ".join(parts))
+
+
+# Metrics
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def samples(self) -> List[Tuple[str, float]]:
+        result = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            result.append((f'le="{bound}"', cumulative))
+        result.append(('le="+Inf"', self.count))
+        return result
+
+
+class MetricsRegistry:
+    """Process metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        # name -> (type, help, {label string: metric or callback})
+        self._families: Dict[str, Tuple[str, str, Dict[str, object]]] = {}
+
+    def _register(self, kind: str, name: str, help_text: str, labels: Optional[Dict[str, str]], metric):
+        family = self._families.setdefault(name, (kind, help_text, {}))
+        label_text = ",".join(f'{key}="{value}"' for key,
+                              value in (labels or {}).items())
+        family[2][label_text] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._register("counter", name, help_text, labels, Counter())
+
+    def gauge(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Gauge:
+        return self._register("gauge", name, help_text, labels, Gauge())
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...],
+                  labels: Optional[Dict[str, str]] = None) -> Histogram:
+        return self._register("histogram", name, help_text, labels, Histogram(buckets))
+
+    def callback(self, kind: str, name: str, help_text: str, read: Callable[[], float]):
+        """Register a counter or gauge whose value is read at scrape time"""
+        self._register(kind, name, help_text, None, read)
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help_text, metrics) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for label_text, metric in metrics.items():
+                if isinstance(metric, Histogram):
+                    prefix = f"{label_text}," if label_text else ""
+                    for bucket, value in metric.samples():
+                        lines.append(f"{name}_bucket{{{prefix}{bucket}}} {value}")
+                    suffix = f"{{{label_text}}}" if label_text else ""
+                    lines.append(f"{name}_sum{suffix} {metric.sum}")
+                    lines.append(f"{name}_count{suffix} {metric.count}")
+                    continue
+                value = metric() if callable(metric) else metric.value
+                suffix = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STARTED = time.monotonic()
+LOOP_LAG = metrics.gauge("boss_timer_event_loop_lag_seconds",
+                         "How late the event loop last woke a sleeping task")
+TICK_SECONDS = metrics.histogram("boss_timer_live_tick_seconds",
+                                 "Time spent in each live update tick", LATENCY_BUCKETS)
+TICK_OVERRUNS = metrics.counter("boss_timer_live_tick_overruns_total",
+                                "Live update ticks that ran late or over their interval")
+TICK_ERRORS = metrics.counter("boss_timer_live_tick_errors_total",
+                              "Live update ticks that raised an error")
+RENDER_SECONDS = metrics.histogram("boss_timer_table_render_seconds",
+                                   "Time to render one guild's boss table", LATENCY_BUCKETS)
+EDIT_SECONDS = metrics.histogram("boss_timer_live_edit_seconds",
+                                 "Latency of live message edit requests", LATENCY_BUCKETS)
+EDIT_ERRORS = metrics.counter("boss_timer_live_edit_errors_total",
+                              "Live message edits that failed")
+RATE_LIMIT_HITS = metrics.counter("boss_timer_rate_limit_hits_total",
+                                  "Requests Discord answered with 429")
+DB_READ_SECONDS = metrics.histogram("boss_timer_db_query_seconds", "SQLite query time",
+                                    LATENCY_BUCKETS, {"op": "read"})
+DB_WRITE_SECONDS = metrics.histogram("boss_timer_db_query_seconds", "SQLite query time",
+                                     LATENCY_BUCKETS, {"op": "write"})
+KILL_BATCH_SIZE = metrics.histogram("boss_timer_kill_batch_size", "Kill reports committed per transaction",
+                                    (1, 2, 5, 10, 20, 50, 100, 250, 500))
+KILL_DUPLICATES = metrics.counter("boss_timer_kill_duplicates_total",
+                                  "Kill reports merged into a near-simultaneous report")
+COMMANDS_THROTTLED = metrics.counter("boss_timer_commands_throttled_total",
+                                     "Commands rejected by the per user, channel and guild limits")
+RENDER_CACHE_HITS = metrics.counter("boss_timer_render_cache_hits_total",
+                                    "!bosslist replies served from a cached render")
+
+
+class RateLimitCounter(logging.Handler):
+    """Count the 429 responses discord.py logs
+
+    Most 429s are slept through and retried inside discord.py, so its log
+    record is the only place every one of them can be seen.
+    """
+
+    def emit(self, record: logging.LogRecord):
+        if str(record.msg).startswith("We are being rate limited."):
+            RATE_LIMIT_HITS.inc()
+
+
+logging.getLogger("discord.http").addHandler(RateLimitCounter(logging.WARNING))
+
+# Boss roster: bosses with their aliases and short table names, plus short
+# location names. JSON, or TOML when the file name ends in .toml
+BOSS_DATA_PATH = os.environ.get(
+    "BOSS_DATA_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bosses.json"))
+
+
+def read_roster_file(path: str) -> dict:
+    """Read the boss roster file"""
+    with open(path, "rb") as roster_file:
+        if path.endswith(".toml"):
+            if tomllib is None:
+                raise ValueError("TOML rosters need Python 3.11 or newer")
+            return tomllib.load(roster_file)
+        return json.load(roster_file)
+
+
+# Weekly slots are stored as seconds since Monday 00:00; 1970-01-05 was a
+# Monday, so (local epoch - MONDAY_EPOCH) % WEEK_SECONDS is the week position
+WEEK_SECONDS = 7 * 24 * 3600
+MONDAY_EPOCH = 4 * 24 * 3600
+
+
+class BossSchedule:
+    """A boss entry compiled once: parsed spawn rule and table strings"""
+
+    __slots__ = ("name", "level", "armor", "location", "fixed_time",
+                 "interval", "weekly_slots", "week_offsets", "label",
+                 "fixed_time_display", "short_location")
+
+    def __init__(self, name: str, level: int, armor: str, location: str, fixed_time: str,
+                 interval: Optional[timedelta], weekly_slots: Tuple[Tuple[int, int, int], ...],
+                 label: str, fixed_time_display: str, short_location: str):
+        self.name = name
+        self.level = level
+        self.armor = armor
+        self.location = location
+        self.fixed_time = fixed_time
+        # Either a respawn interval or weekly (weekday, hour, minute) slots
+        self.interval = interval
+        self.weekly_slots = weekly_slots
+        # The weekly slots as sorted seconds since Monday 00:00
+        self.week_offsets = tuple(sorted(
+            day * 86400 + hour * 3600 + minute * 60 for day, hour, minute in weekly_slots))
+        self.label = label
+        self.fixed_time_display = fixed_time_display
+        self.short_location = short_location
+
+
+# Discord's length limits for a message and an embed description
+MESSAGE_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+# Characters a table message adds around the table: code fences and footer
+TABLE_MESSAGE_OVERHEAD = 64
+TABLE_HEADERS = ("Boss(Lvl)", "Time Left", "Fixed Time", "Location")
+# Table columns are at least two characters wider than their header
+TABLE_HEADER_PADDING = 2
+TIME_LEFT_MIN_WIDTH = len(TABLE_HEADERS[1]) + TABLE_HEADER_PADDING
+TABLE_FORMATS = ("table", "compact", "embed")
+# Live tables are edited as plain message content
+LIVE_TABLE_FORMATS = ("table", "compact")
+# Rosters whose table layout is kept
+TABLE_LAYOUT_CACHE_SIZE = 512
+# Seconds a !bosslist reply is reused; any change to the guild's timers
+# drops it sooner
+RENDER_CACHE_SECONDS = 10
+
+
+class TableLayout:
+    """The fixed columns of one roster's boss table, padded once
+
+    Rows are stored as the text before and after the Time Left cell, so a
+    render only pads that cell. The layout matches tabulate's "simple"
+    format: two spaces between columns and no padding on the last one.
+    """
+
+    __slots__ = ("header", "time_width", "rows", "compact_rows")
+
+    def __init__(self, schedules: List[BossSchedule], time_width: int):
+        columns = [
+            [schedule.label for schedule in schedules],
+            [schedule.fixed_time_display for schedule in schedules],
+            [schedule.short_location for schedule in schedules],
+        ]
+        label_width, fixed_width, location_width = (
+            max([len(header) + TABLE_HEADER_PADDING] + [len(cell) for cell in cells])
+            for header, cells in zip(TABLE_HEADERS[::2] + TABLE_HEADERS[3:], columns))
+        self.time_width = time_width
+        self.header = "  ".join([
+            TABLE_HEADERS[0].ljust(label_width), TABLE_HEADERS[1].ljust(time_width),
+            TABLE_HEADERS[2].ljust(fixed_width), TABLE_HEADERS[3],
+        ]) + "\n" + "  ".join("-" * width for width in
+                               (label_width, time_width, fixed_width, location_width))
+        self.rows = {
+            schedule.name: (schedule.label.ljust(label_width) + "  ",
+                            "  " + schedule.fixed_time_display.ljust(fixed_width)
+                            + "  " + schedule.short_location)
+            for schedule in schedules
+        }
+        compact_width = max((len(schedule.label) for schedule in schedules), default=0)
+        self.compact_rows = {schedule.name: schedule.label.ljust(compact_width) + "  "
+                             for schedule in schedules}
+
+
+class GuildState:
+    """Timers and settings of a single guild"""
+
+    __slots__ = ("guild_id", "timezone", "roster", "next_spawns", "last_used")
+
+    def __init__(self, guild_id: int, timezone, roster: Tuple[str, ...], next_spawns: Dict[str, datetime]):
+        self.guild_id = guild_id
+        self.timezone = timezone
+        # Bosses shown in this guild's tables, in display order
+        self.roster = roster
+        # Latest next_spawn per boss, kept in sync by record_kill
+        self.next_spawns = next_spawns
+        self.last_used = time.monotonic()
+
+
+class _TrieNode:
+    __slots__ = ("children", "names", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # Bosses with an alias passing through this node
+        self.names: Set[str] = set()
+        # Boss whose alias ends exactly here
+        self.terminal: Optional[str] = None
+
+
+# Share of the input a contained alias must exceed to count as a match
+CONTAINED_ALIAS_MIN_SHARE = 0.75
+
+
+class BossNameResolver:
+    """Resolve player input to boss names
+
+    Built once from the roster: an alias table for exact matches, a prefix
+    trie for abbreviations and a trigram index that narrows typo matching
+    to a few candidates before edit distances are computed.
+    """
+
+    def __init__(self, names, aliases: Dict[str, str]):
+        self.aliases: Dict[str, str] = {}
+        for name in names:
+            self.aliases[self.normalize(name)] = name
+        for alias, name in aliases.items():
+            self.aliases[self.normalize(alias)] = name
+
+        self._root = _TrieNode()
+        self._trigrams: Dict[str, Set[str]] = {}
+        for alias, name in self.aliases.items():
+            node = self._root
+            for char in alias:
+                node = node.children.setdefault(char, _TrieNode())
+                node.names.add(name)
+            node.terminal = name
+            for trigram in self.trigrams(alias):
+                self._trigrams.setdefault(trigram, set()).add(alias)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return re.sub(r"[\s'_\-]", "", text.lower())
+
+    @staticmethod
+    def trigrams(text: str) -> Set[str]:
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @staticmethod
+    def edit_distance(a: str, b: str) -> int:
+        previous = list(range(len(b) + 1))
+        for i, char_a in enumerate(a, 1):
+            current = [i]
+            for j, char_b in enumerate(b, 1):
+                current.append(min(previous[j] + 1, current[j - 1] + 1,
+                                   previous[j - 1] + (char_a != char_b)))
+            previous = current
+        return previous[-1]
+
+    def resolve(self, text: str, limit: int = 5) -> Tuple[Optional[str], List[str]]:
+        """Return the unambiguous match (or None) and ranked candidates"""
+        key = self.normalize(text)
+        if not key:
+            return None, []
+
+        # Exact name or alias
+        if key in self.aliases:
+            return self.aliases[key], [self.aliases[key]]
+
+        # Abbreviation: every boss with an alias starting with the input
+        node = self._root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                break
+        if node is not None:
+            ranked = sorted(node.names)
+            return (ranked[0] if len(ranked) == 1 else None), ranked[:limit]
+
+        # Input that is a whole alias with a little after it, e.g. "venatus2".
+        # A short alias inside a longer word ("diego", "egor") only makes a
+        # suggestion below
+        node = self._root
+        contained = None
+        for length, char in enumerate(key, 1):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.terminal and length > CONTAINED_ALIAS_MIN_SHARE * len(key):
+                contained = node.terminal
+        if contained:
+            return contained, [contained]
+
+        # Typos: rank aliases sharing trigrams with the input by edit distance
+        shared: Dict[str, int] = {}
+        for trigram in self.trigrams(key):
+            for alias in self._trigrams.get(trigram, ()):
+                shared[alias] = shared.get(alias, 0) + 1
+        best: Dict[str, int] = {}
+        best_alias: Dict[str, str] = {}
+        for alias in sorted(shared, key=shared.get, reverse=True)[:limit * 4]:
+            name = self.aliases[alias]
+            distance = self.edit_distance(key, alias)
+            if distance < best.get(name, distance + 1):
+                best[name] = distance
+                best_alias[name] = alias
+        ranked = sorted(best, key=lambda name: (best[name], name))
+        if not ranked:
+            return None, []
+
+        max_distance = max(1, len(key) // 3)
+        match = ranked[0] if best[ranked[0]] <= max_distance else None
+        if match and len(ranked) > 1 and best[ranked[1]] == best[match]:
+            match = None
+        # Extra letters around a whole alias are not a typo of it ("vego")
+        if match and best_alias[match] in key:
+            match = None
+        return match, ranked[:limit]
+
+
+# Loaded guild states kept in memory, and how long an unused one may idle
+GUILD_CACHE_SIZE = int(os.environ.get("GUILD_CACHE_SIZE", "256"))
+GUILD_CACHE_IDLE_SECONDS = 30 * 60
 
 # Database setup
+DB_PATH = 'boss_timer.db'
+DB_READER_POOL_SIZE = 4
+
+# SQL is kept in module constants so sqlite's statement cache reuses the
+# prepared statements across calls on the long-lived connections.
+# Times are stored as integer epoch seconds (UTC).
+INSERT_KILL_SQL = "INSERT INTO boss_kills (guild_id, boss_name, kill_ts, spawn_ts) VALUES (?, ?, ?, ?)"
+LATEST_SPAWNS_SQL = "SELECT boss_name, spawn_ts FROM boss_state WHERE guild_id = ?"
+LATEST_KILL_SQL = "SELECT kill_ts, spawn_ts FROM boss_state WHERE guild_id = ? AND boss_name = ?"
+SELECT_BOSS_STATE_SQL = "SELECT boss_name, kill_id, kill_ts, spawn_ts FROM boss_state WHERE guild_id = ?"
+RESTORE_BOSS_STATE_SQL = "UPDATE boss_state SET kill_id = ?, kill_ts = ?, spawn_ts = ? WHERE guild_id = ? AND boss_name = ?"
+SELECT_ALERT_CHANNELS_SQL = "SELECT channel_id, guild_id FROM alert_channels"
+INSERT_ALERT_CHANNEL_SQL = "INSERT OR REPLACE INTO alert_channels (channel_id, guild_id) VALUES (?, ?)"
+DELETE_ALERT_CHANNEL_SQL = "DELETE FROM alert_channels WHERE channel_id = ?"
+SELECT_LIVE_MESSAGES_SQL = "SELECT channel_id, guild_id, message_id, format FROM live_messages"
+INSERT_LIVE_MESSAGE_SQL = "INSERT OR REPLACE INTO live_messages (channel_id, guild_id, message_id, format) VALUES (?, ?, ?, ?)"
+DELETE_LIVE_MESSAGE_SQL = "DELETE FROM live_messages WHERE channel_id = ?"
+LATEST_CHANGE_SQL = "SELECT COALESCE(MAX(seq), 0) FROM guild_changes"
+SELECT_CHANGES_SQL = "SELECT seq, guild_id FROM guild_changes WHERE seq > ? ORDER BY seq"
+SELECT_GUILD_SETTINGS_SQL = "SELECT timezone, roster FROM guild_settings WHERE guild_id = ?"
+UPSERT_GUILD_TIMEZONE_SQL = "INSERT INTO guild_settings (guild_id, timezone) VALUES (?, ?) ON CONFLICT(guild_id) DO UPDATE SET timezone = excluded.timezone"
+UPSERT_GUILD_ROSTER_SQL = "INSERT INTO guild_settings (guild_id, roster) VALUES (?, ?) ON CONFLICT(guild_id) DO UPDATE SET roster = excluded.roster"
+
+# Kills recorded before multi-guild support have no guild; they are given
+# to this guild when the column is added (0 keeps them unassigned)
+DEFAULT_GUILD_ID = int(os.environ.get("DEFAULT_GUILD_ID", "0"))
+
+
+class Database:
+    """Long-lived SQLite connections: one writer and a small pool of readers"""
+
+    def __init__(self, path: str, readers: int = DB_READER_POOL_SIZE):
+        self.path = path
+        self.reader_count = readers
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: asyncio.Queue = asyncio.Queue()
+        self._all_readers: List[aiosqlite.Connection] = []
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path, cached_statements=128)
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    async def open(self):
+        """Open the writer and reader connections (no-op if already open)"""
+        if self.is_open:
+            return
+        self._writer = await self._connect()
+        # NORMAL in WAL mode skips the fsync on commit; every write goes
+        # through this connection, so a committed kill survives power loss
+        await self._writer.execute("PRAGMA synchronous=FULL")
+        for _ in range(self.reader_count):
+            conn = await self._connect()
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+
+    async def close(self):
+        """Close every connection, waiting for in-flight writes to finish"""
+        if not self.is_open:
+            return
+        async with self._write_lock:
+            writer, self._writer = self._writer, None
+            await writer.close()
+        readers, self._all_readers = self._all_readers, []
+        self._readers = asyncio.Queue()
+        for conn in readers:
+            await conn.close()
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a reader connection from the pool"""
+        if self._writer is None:
+            raise RuntimeError("Database is not open")
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            if conn in self._all_readers:
+                self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Hold the writer connection for one transaction"""
+        async with self._write_lock:
+            if self._writer is None:
+                raise RuntimeError("Database is not open")
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    async def fetchone(self, sql: str, params: tuple = ()):
+        async with self.reader() as conn:
+            started = time.perf_counter()
+            async with conn.execute(sql, params) as cursor:
+                row = await cursor.fetchone()
+            DB_READ_SECONDS.observe(time.perf_counter() - started)
+            return row
+
+    async def fetchall(self, sql: str, params: tuple = ()):
+        async with self.reader() as conn:
+            started = time.perf_counter()
+            async with conn.execute(sql, params) as cursor:
+                rows = await cursor.fetchall()
+            DB_READ_SECONDS.observe(time.perf_counter() - started)
+            return rows
+
+    async def execute(self, sql: str, params: tuple = ()):
+        async with self.writer() as conn:
+            started = time.perf_counter()
+            await conn.execute(sql, params)
+        # Includes the commit, which is where a write spends its time
+        DB_WRITE_SECONDS.observe(time.perf_counter() - started)
+
+    async def executemany(self, sql: str, rows: List[tuple]):
+        async with self.writer() as conn:
+            started = time.perf_counter()
+            await conn.executemany(sql, rows)
+        DB_WRITE_SECONDS.observe(time.perf_counter() - started)
+
+
+db = Database(DB_PATH)
+
+
+async def add_guild_column(conn: aiosqlite.Connection, table: str):
+    """Add the guild_id column to a table created before guild support"""
+    async with conn.execute(f"PRAGMA table_info({table})") as cursor:
+        columns = [row[1] for row in await cursor.fetchall()]
+    if "guild_id" in columns:
+        return
+    await conn.execute(
+        f"ALTER TABLE {table} ADD COLUMN guild_id INTEGER NOT NULL DEFAULT 0")
+    if DEFAULT_GUILD_ID:
+        await conn.execute(f"UPDATE {table} SET guild_id = ?", (DEFAULT_GUILD_ID,))
+
+
+async def migrate_guild_tables(conn: aiosqlite.Connection):
+    """Schema as it was before versioning: ISO text times, guild columns"""
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS boss_kills (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            boss_name TEXT NOT NULL,
+            kill_time DATETIME NOT NULL,
+            next_spawn DATETIME
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS alert_channels (
+            channel_id INTEGER PRIMARY KEY
+        )
+    ''')
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            timezone TEXT,
+            roster TEXT
+        )
+    ''')
+    await add_guild_column(conn, "boss_kills")
+    await add_guild_column(conn, "alert_channels")
+
+
+async def migrate_epoch_kills(conn: aiosqlite.Connection):
+    """Rebuild boss_kills with epoch second times and lookup indexes"""
+    await conn.execute('''
+        CREATE TABLE boss_kills_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL DEFAULT 0,
+            boss_name TEXT NOT NULL,
+            kill_ts INTEGER NOT NULL,
+            spawn_ts INTEGER
+        )
+    ''')
+    await conn.execute('''
+        INSERT INTO boss_kills_new (id, guild_id, boss_name, kill_ts, spawn_ts)
+        SELECT id, guild_id, boss_name,
+               CAST(strftime('%s', kill_time) AS INTEGER),
+               CAST(strftime('%s', next_spawn) AS INTEGER)
+        FROM boss_kills
+    ''')
+    await conn.execute("DROP TABLE boss_kills")
+    await conn.execute("ALTER TABLE boss_kills_new RENAME TO boss_kills")
+    await conn.execute(
+        "CREATE INDEX idx_boss_kills_boss_id ON boss_kills (guild_id, boss_name, id)")
+    await conn.execute(
+        "CREATE INDEX idx_boss_kills_boss_kill_ts ON boss_kills (guild_id, boss_name, kill_ts)")
+
+
+async def migrate_boss_state(conn: aiosqlite.Connection):
+    """Keep the latest kill of every boss in boss_state via a trigger"""
+    await conn.execute('''
+        CREATE TABLE boss_state (
+            guild_id INTEGER NOT NULL,
+            boss_name TEXT NOT NULL,
+            kill_id INTEGER NOT NULL,
+            kill_ts INTEGER NOT NULL,
+            spawn_ts INTEGER,
+            PRIMARY KEY (guild_id, boss_name)
+        ) WITHOUT ROWID
+    ''')
+    await conn.execute('''
+        CREATE TRIGGER boss_kills_latest AFTER INSERT ON boss_kills
+        BEGIN
+            INSERT INTO boss_state (guild_id, boss_name, kill_id, kill_ts, spawn_ts)
+            VALUES (NEW.guild_id, NEW.boss_name, NEW.id, NEW.kill_ts, NEW.spawn_ts)
+            ON CONFLICT (guild_id, boss_name) DO UPDATE SET
+                kill_id = excluded.kill_id,
+                kill_ts = excluded.kill_ts,
+                spawn_ts = excluded.spawn_ts;
+        END
+    ''')
+    await conn.execute('''
+        INSERT INTO boss_state (guild_id, boss_name, kill_id, kill_ts, spawn_ts)
+        SELECT guild_id, boss_name, id, kill_ts, spawn_ts FROM boss_kills
+        WHERE id IN (SELECT MAX(id) FROM boss_kills GROUP BY guild_id, boss_name)
+    ''')
+
+
+async def migrate_live_messages(conn: aiosqlite.Connection):
+    """Persist live table subscriptions so they survive restarts"""
+    await conn.execute('''
+        CREATE TABLE live_messages (
+            channel_id INTEGER PRIMARY KEY,
+            guild_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL
+        )
+    ''')
+
+
+async def migrate_guild_changes(conn: aiosqlite.Connection):
+    """Log which guilds changed, so other bot processes can reload them
+
+    Every kill or settings write bumps the guild's row to a new sequence
+    number; processes poll for rows past the last number they have seen.
+    """
+    await conn.execute('''
+        CREATE TABLE guild_changes (
+            guild_id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL
+        )
+    ''')
+    await conn.execute("CREATE INDEX idx_guild_changes_seq ON guild_changes (seq)")
+    bump = '''
+            INSERT INTO guild_changes (guild_id, seq)
+            VALUES (NEW.guild_id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM guild_changes))
+            ON CONFLICT (guild_id) DO UPDATE SET seq = excluded.seq;
+    '''
+    await conn.execute(f"CREATE TRIGGER boss_kills_changed AFTER INSERT ON boss_kills BEGIN {bump} END")
+    await conn.execute(f"CREATE TRIGGER guild_settings_added AFTER INSERT ON guild_settings BEGIN {bump} END")
+    await conn.execute(f"CREATE TRIGGER guild_settings_changed AFTER UPDATE ON guild_settings BEGIN {bump} END")
+
+
+async def migrate_live_formats(conn: aiosqlite.Connection):
+    """Remember the table format each live message was started with"""
+    await conn.execute("ALTER TABLE live_messages ADD COLUMN format TEXT NOT NULL DEFAULT 'table'")
+
+
+# Schema migrations in order; the database's user_version records how many
+# have been applied. Only ever append to this list.
+MIGRATIONS: List[Callable[[aiosqlite.Connection], Awaitable[None]]] = [
+    migrate_guild_tables,
+    migrate_epoch_kills,
+    migrate_boss_state,
+    migrate_live_messages,
+    migrate_guild_changes,
+    migrate_live_formats,
+]
+
+
+# Seconds to wait for another process that is migrating the same file
+MIGRATION_LOCK_TIMEOUT_SECONDS = 600
+
+
+async def migrate_db():
+    """Apply pending migrations, each in its own transaction
+
+    Several bot processes may start on one file at the same time. Each
+    migration takes the write lock before reading user_version, so they
+    apply migrations in turn and later processes skip the ones done.
+    """
+    deadline = time.monotonic() + MIGRATION_LOCK_TIMEOUT_SECONDS
+    async with db.writer() as conn:
+        while True:
+            try:
+                await conn.execute("BEGIN IMMEDIATE")
+            except aiosqlite.OperationalError:
+                # busy_timeout ran out while another process migrates
+                if time.monotonic() > deadline:
+                    raise
+                continue
+            async with conn.execute("PRAGMA user_version") as cursor:
+                version = (await cursor.fetchone())[0]
+            if version >= len(MIGRATIONS):
+                await conn.rollback()
+                return
+            migration = MIGRATIONS[version]
+            try:
+                await migration(conn)
+                await conn.execute(f"PRAGMA user_version = {version + 1}")
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+            log_event(logging.INFO, "db_migrated", version=version + 1,
+                      migration=migration.__name__)
 
 
 async def init_db():
-    async with aiosqlite.connect('boss_timer.db') as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS boss_kills (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+    await db.open()
+    await migrate_db()
+
+
+# Kills older than this are moved out of boss_kills into the archive file
+KILL_RETENTION_DAYS = int(os.environ.get("KILL_RETENTION_DAYS", "90"))
+ARCHIVE_DB_PATH = os.environ.get("ARCHIVE_DB_PATH", "boss_timer_archive.db")
+# Rows moved per transaction, so writes from commands never wait long
+ARCHIVE_BATCH_SIZE = 500
+# Free pages released per incremental vacuum step
+VACUUM_STEP_PAGES = 1000
+
+
+async def db_size_bytes(conn: aiosqlite.Connection) -> int:
+    async with conn.execute("PRAGMA page_count") as cursor:
+        page_count = (await cursor.fetchone())[0]
+    async with conn.execute("PRAGMA page_size") as cursor:
+        page_size = (await cursor.fetchone())[0]
+    return page_count * page_size
+
+
+async def archive_old_kills(cutoff_ts: int) -> int:
+    """Move kills older than cutoff_ts into the archive database
+
+    boss_state keeps the latest kill of every boss, so archiving old history
+    never loses a current timer. Returns the number of rows moved.
+    """
+    async with db.writer() as conn:
+        async with conn.execute("PRAGMA database_list") as cursor:
+            attached = {row[1] for row in await cursor.fetchall()}
+        if "archive" not in attached:
+            await conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DB_PATH,))
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS archive.boss_kills (
+                id INTEGER PRIMARY KEY,
+                guild_id INTEGER NOT NULL,
                 boss_name TEXT NOT NULL,
-                kill_time DATETIME NOT NULL,
-                next_spawn DATETIME
+                kill_ts INTEGER NOT NULL,
+                spawn_ts INTEGER
             )
         ''')
-        await db.commit()
+
+    moved = 0
+    while True:
+        # One short transaction per batch; the writer lock is released in
+        # between so kill reports and the live loop are not held up
+        async with db.writer() as conn:
+            async with conn.execute(
+                "SELECT id FROM boss_kills WHERE kill_ts < ? ORDER BY id LIMIT ?",
+                (cutoff_ts, ARCHIVE_BATCH_SIZE)
+            ) as cursor:
+                ids = [row[0] for row in await cursor.fetchall()]
+            if not ids:
+                break
+            placeholders = ",".join("?" * len(ids))
+            await conn.execute(
+                f"INSERT OR IGNORE INTO archive.boss_kills SELECT id, guild_id, boss_name, kill_ts, spawn_ts FROM boss_kills WHERE id IN ({placeholders})",
+                ids
+            )
+            await conn.execute(
+                f"DELETE FROM boss_kills WHERE id IN ({placeholders})", ids)
+        moved += len(ids)
+        await asyncio.sleep(0)
+    return moved
+
+
+async def compact_db() -> int:
+    """Release free pages back to the filesystem; returns bytes reclaimed"""
+    async with db.writer() as conn:
+        before = await db_size_bytes(conn)
+        async with conn.execute("PRAGMA auto_vacuum") as cursor:
+            auto_vacuum = (await cursor.fetchone())[0]
+
+    if auto_vacuum != 2:
+        # Switching to incremental auto-vacuum needs one full VACUUM
+        async with db.writer() as conn:
+            await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await conn.execute("VACUUM")
+    else:
+        while True:
+            async with db.writer() as conn:
+                async with conn.execute("PRAGMA freelist_count") as cursor:
+                    free_pages = (await cursor.fetchone())[0]
+                if not free_pages:
+                    break
+                # The pragma frees one page per step, and execute() stops
+                # after the first one; executescript runs it to completion
+                await conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+            await asyncio.sleep(0)
+
+    async with db.writer() as conn:
+        await conn.execute("PRAGMA optimize")
+        after = await db_size_bytes(conn)
+    return before - after
+
+
+# Kill reports queued while a commit is running share the next transaction;
+# a window above 0 also holds the first report of a batch that long
+KILL_BATCH_WINDOW_SECONDS = float(os.environ.get("KILL_BATCH_WINDOW_SECONDS", "0"))
+KILL_BATCH_MAX = 500
+# A report of the same boss whose kill and spawn times are within this many
+# seconds of a recent report is treated as the same kill
+KILL_DEDUP_SECONDS = 10
+# !dead reports use the current time, so several players reporting the same
+# kill land further apart; they get a wider window
+DEAD_DEDUP_SECONDS = int(os.environ.get("DEAD_DEDUP_SECONDS", "60"))
+
+
+class KillWriter:
+    """Group commit for kill reports
+
+    Reports queue up while a batch is being written and for a short window
+    after the first one, then go to SQLite in one executemany and a single
+    commit, so a batch costs one fsync however many reports it holds. Each
+    report's future resolves once its batch is durable.
+    """
+
+    def __init__(self, window: float, max_batch: int, dedup_seconds: int, retain_seconds: int = 0):
+        self.window = window
+        self.max_batch = max_batch
+        self.dedup_seconds = dedup_seconds
+        # Recent reports are kept for the widest window any report may use
+        self.retain_seconds = max(dedup_seconds, retain_seconds)
+        # (guild id, boss name, kill ts, spawn ts, future) not yet written
+        self._pending: List[Tuple[int, str, int, int, asyncio.Future]] = []
+        # (guild id, boss name) -> (monotonic time, kill ts, spawn ts, future)
+        # of the latest report, in report order
+        self._recent: Dict[Tuple[int, str], Tuple[float, int, int, asyncio.Future]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Write any queued reports, then stop"""
+        task, self._task = self._task, None
+        if task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def submit(self, guild_id: int, boss_name: str, kill_ts: int, spawn_ts: int,
+               dedup_seconds: Optional[int] = None) -> Tuple[asyncio.Future, bool]:
+        """Queue a kill, or merge it into a recent report of the same kill
+
+        Returns a future for the (kill_ts, spawn_ts) that is stored, and
+        whether the report was merged. dedup_seconds widens or narrows the
+        merge window for this report, up to retain_seconds.
+        """
+        window = self.dedup_seconds if dedup_seconds is None else min(dedup_seconds, self.retain_seconds)
+        key = (guild_id, boss_name)
+        recent = self._recent.get(key)
+        if (recent is not None and time.monotonic() - recent[0] <= window
+                and abs(recent[1] - kill_ts) <= window
+                and abs(recent[2] - spawn_ts) <= window):
+            KILL_DUPLICATES.inc()
+            return recent[3], True
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((guild_id, boss_name, kill_ts, spawn_ts, future))
+        self._recent.pop(key, None)
+        self._recent[key] = (time.monotonic(), kill_ts, spawn_ts, future)
+        self.start()
+        self._wakeup.set()
+        return future, False
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                # Let reports that arrive together share the transaction
+                await asyncio.sleep(self.window)
+                continue
+            await self._flush()
+
+    async def _flush(self):
+        batch = self._pending[:self.max_batch]
+        del self._pending[:self.max_batch]
+        try:
+            await db.executemany(INSERT_KILL_SQL, [row[:4] for row in batch])
+        except Exception as e:
+            log_event(logging.ERROR, "kill_write_failed", reports=len(batch), error=e)
+            for guild_id, boss_name, _, _, future in batch:
+                # Later reports must not be merged into one that was lost
+                recent = self._recent.get((guild_id, boss_name))
+                if recent is not None and recent[3] is future:
+                    del self._recent[(guild_id, boss_name)]
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        KILL_BATCH_SIZE.observe(len(batch))
+        for _, _, kill_ts, spawn_ts, future in batch:
+            if not future.done():
+                future.set_result((kill_ts, spawn_ts))
+        cutoff = time.monotonic() - self.retain_seconds
+        while self._recent:
+            key = next(iter(self._recent))
+            if self._recent[key][0] > cutoff:
+                break
+            del self._recent[key]
+
+
+kill_writes = KillWriter(KILL_BATCH_WINDOW_SECONDS, KILL_BATCH_MAX, KILL_DEDUP_SECONDS,
+                         DEAD_DEDUP_SECONDS)
 
 
 class BossTimer:
     def __init__(self):
-        self.bosses = {boss["name"]: boss for boss in BOSS_DATA}
         self.day_map = {
             "Mon": 0, "Tue": 1, "Wed": 2, "Thu": 3,
             "Fri": 4, "Sat": 5, "Sun": 6
         }
-        self.live_messages = {}
+        # channel id -> partial message handle that can be edited directly
+        self.live_messages: Dict[int, discord.PartialMessage] = {}
+        # channel id -> guild id of each live message
+        self.live_channels: Dict[int, int] = {}
+        # channel id -> table format of live messages not using "table"
+        self.live_formats: Dict[int, str] = {}
+        # (guild id, table format) -> (expiry, rendered !bosslist reply)
+        self.render_cache: Dict[Tuple[int, str], Tuple[float, Union[List[str], discord.Embed]]] = {}
+        # channel id -> hash of the table body last sent to that channel
+        self.live_hashes: Dict[int, int] = {}
+        # channel id -> guild id of channels subscribed to spawn alerts
+        self.alert_channels: Dict[int, int] = {}
+        # Default timezone for guilds that have not set one
         self.timezone = pytz.timezone('Asia/Manila')
 
-        # Create a case-insensitive mapping of boss names
-        self.boss_name_mapping = {}
-        for boss_name in self.bosses.keys():
-            # Create simplified versions for matching
-            simplified = boss_name.lower().replace(" ", "")
-            self.boss_name_mapping[simplified] = boss_name
-
-            # Also add common short names
-            if "lady" in boss_name.lower():
-                self.boss_name_mapping["dalia"] = boss_name
-                self.boss_name_mapping["lady"] = boss_name
+        # Guild states are loaded on first use and kept in LRU order so
+        # idle guilds can be evicted; guilds with live tables or alert
+        # subscriptions stay loaded
+        self.guilds: "OrderedDict[int, GuildState]" = OrderedDict()
+        self._guild_loads: Dict[int, asyncio.Future] = {}
+        self.guild_cache_hits = 0
+        self.guild_cache_misses = 0
+
+        # Roster entries as read from the file, their compiled schedules,
+        # and extra names players use for bosses
+        self.bosses: Dict[str, dict] = {}
+        self.schedules: Dict[str, BossSchedule] = {}
+        self.aliases: Dict[str, str] = {}
+        # Case, space and typo tolerant boss name lookups
+        self.resolver: Optional[BossNameResolver] = None
+        self.apply_roster(read_roster_file(BOSS_DATA_PATH))
+        # (roster, time left width) -> precomputed table columns
+        self._layouts: Dict[Tuple[Tuple[str, ...], int], TableLayout] = {}
+        # timezone name -> (transition epochs, UTC offsets) for bulk spawns
+        self._offset_tables: Dict[str, Tuple["numpy.ndarray", "numpy.ndarray"]] = {}
 
     def find_boss_name(self, input_name):
         """Find the correct boss name from various input formats"""
-        input_name = input_name.lower().replace(" ", "").replace("'", "")
+        return self.resolver.resolve(input_name)[0]
 
-        # Direct match
-        if input_name in self.boss_name_mapping:
-            return self.boss_name_mapping[input_name]
-
-        # Partial match
-        for simplified_name, real_name in self.boss_name_mapping.items():
-            if input_name in simplified_name or simplified_name in input_name:
-                return real_name
-
-        return None
+    def boss_not_found_message(self, input_name: str) -> str:
+        """Explain a failed boss lookup, suggesting close matches"""
+        suggestions = self.resolver.resolve(input_name)[1]
+        if suggestions:
+            return f"Boss '{input_name}' not found. Did you mean: {', '.join(suggestions)}?"
+        return f"Boss '{input_name}' not found."
 
     def parse_fixed_time(self, fixed_time: str) -> Tuple[Optional[int], Optional[List[Tuple[int, int]]]]:
         """Parse fixed time string into hours or weekly schedule"""
@@ -159,32 +1113,128 @@ class BossTimer:
 
     def calculate_next_spawn(self, boss_name: str, kill_time: datetime) -> datetime:
         """Calculate next spawn time based on boss fixed time"""
-        boss = self.bosses[boss_name]
-        hours, weekly_schedule = self.parse_fixed_time(boss["fixed_time"])
-
-        if hours:
-            return kill_time + timedelta(hours=hours)
-
-        if weekly_schedule:
-            next_times = []
-            for day, hour, minute in weekly_schedule:
-                days_ahead = (day - kill_time.weekday()) % 7
-                if days_ahead == 0 and (kill_time.hour > hour or
-                                        (kill_time.hour == hour and kill_time.minute >= minute)):
-                    days_ahead = 7
-
-                next_time = kill_time + timedelta(days=days_ahead)
-                next_time = next_time.replace(
-                    hour=hour, minute=minute, second=0, microsecond=0)
-                next_times.append(next_time)
-
-            return min(next_times)
-
-        return kill_time + timedelta(hours=24)
-
-    def format_time_left(self, next_spawn: datetime) -> str:
+        schedule = self.schedules[boss_name]
+
+        if schedule.interval:
+            return kill_time + schedule.interval
+
+        next_times = []
+        for day, hour, minute in schedule.weekly_slots:
+            days_ahead = (day - kill_time.weekday()) % 7
+            if days_ahead == 0 and (kill_time.hour > hour or
+                                    (kill_time.hour == hour and kill_time.minute >= minute)):
+                days_ahead = 7
+
+            next_time = kill_time + timedelta(days=days_ahead)
+            next_time = next_time.replace(
+                hour=hour, minute=minute, second=0, microsecond=0)
+            next_times.append(next_time)
+
+        return min(next_times)
+
+    def calculate_next_spawns(self, boss_names: Sequence[str], kill_ts: Sequence[int], timezone) -> List[int]:
+        """Next spawn epochs for many (boss, kill epoch) pairs in one pass
+
+        Gives the same results as calculate_next_spawn: weekly slots are wall
+        clock times in the timezone, at the UTC offset of the kill.
+        """
+        if numpy is None:
+            return [self._next_spawn_ts(self.schedules[name], ts, timezone)
+                    for name, ts in zip(boss_names, kill_ts)]
+
+        index = {name: i for i, name in enumerate(self.schedules)}
+        kills = numpy.asarray(kill_ts, dtype=numpy.int64)
+        codes = numpy.fromiter((index[name] for name in boss_names),
+                               dtype=numpy.int64, count=len(kills))
+        spawns = numpy.empty_like(kills)
+        position = None
+        for code, schedule in enumerate(self.schedules.values()):
+            mask = codes == code
+            if not mask.any():
+                continue
+            if schedule.interval:
+                spawns[mask] = kills[mask] + int(schedule.interval.total_seconds())
+                continue
+            if position is None:
+                local = kills + self._utc_offsets(timezone, kills)
+                position = (local - MONDAY_EPOCH) % WEEK_SECONDS
+            slots = numpy.asarray(schedule.week_offsets, dtype=numpy.int64)
+            kill_position = position[mask]
+            # First slot after the kill's minute, wrapping into next week
+            following = numpy.searchsorted(
+                slots, kill_position - kill_position % 60, side="right")
+            wrapped = following == len(slots)
+            slot_position = slots[numpy.where(wrapped, 0, following)] + wrapped * WEEK_SECONDS
+            spawns[mask] = kills[mask] + slot_position - kill_position
+        return spawns.tolist()
+
+    def _next_spawn_ts(self, schedule: BossSchedule, kill_ts: int, timezone) -> int:
+        if schedule.interval:
+            return kill_ts + int(schedule.interval.total_seconds())
+        offset = datetime.fromtimestamp(kill_ts, timezone).utcoffset()
+        position = (kill_ts + int(offset.total_seconds()) - MONDAY_EPOCH) % WEEK_SECONDS
+        following = bisect.bisect_right(schedule.week_offsets, position - position % 60)
+        if following == len(schedule.week_offsets):
+            slot_position = schedule.week_offsets[0] + WEEK_SECONDS
+        else:
+            slot_position = schedule.week_offsets[following]
+        return kill_ts + slot_position - position
+
+    def _utc_offsets(self, timezone, kill_ts: "numpy.ndarray") -> "numpy.ndarray":
+        """UTC offset in seconds at each epoch, looked up in pytz's transitions"""
+        if not isinstance(timezone, pytz.tzinfo.DstTzInfo):
+            offset = int(timezone.utcoffset(None).total_seconds())
+            return numpy.full(len(kill_ts), offset, dtype=numpy.int64)
+        table = self._offset_tables.get(timezone.zone)
+        if table is None:
+            starts = numpy.array([calendar.timegm(start.timetuple())
+                                  for start in timezone._utc_transition_times], dtype=numpy.int64)
+            offsets = numpy.array([int(info[0].total_seconds())
+                                   for info in timezone._transition_info], dtype=numpy.int64)
+            table = self._offset_tables[timezone.zone] = (starts, offsets)
+        starts, offsets = table
+        return offsets[numpy.searchsorted(starts, kill_ts, side="right") - 1]
+
+    def _spawn_stream(self, state: GuildState, boss_name: str, start: datetime) -> Iterator[Tuple[datetime, str, bool]]:
+        """Endless (spawn, boss, projected) events of one boss from start on
+
+        Weekly bosses follow their slots. Interval bosses continue from the
+        recorded next spawn as if every spawn were killed straight away, so
+        those events are marked as projected.
+        """
+        schedule = self.schedules[boss_name]
+        if schedule.interval is None:
+            spawn = self.calculate_next_spawn(boss_name, start)
+            while True:
+                yield spawn, boss_name, False
+                spawn = self.calculate_next_spawn(boss_name, spawn)
+
+        spawn = state.next_spawns.get(boss_name)
+        if spawn is None:
+            return
+        projected = False
+        if spawn < start:
+            spawn += math.ceil((start - spawn) / schedule.interval) * schedule.interval
+            projected = True
+        while True:
+            yield spawn, boss_name, projected
+            spawn += schedule.interval
+            projected = True
+
+    def forecast_spawns(self, state: GuildState, start: datetime, end: datetime) -> Iterator[Tuple[datetime, str, bool]]:
+        """Spawns of the guild's roster between start and end, soonest first
+
+        The per-boss streams are merged lazily, so taking the first page of a
+        long forecast only computes that page.
+        """
+        streams = [self._spawn_stream(state, name, start) for name in state.roster
+                   if name in self.schedules]
+        return itertools.takewhile(lambda event: event[0] <= end, heapq.merge(*streams))
+
+    def format_time_left(self, next_spawn: datetime, now: Optional[datetime] = None) -> str:
         """Format time left until next spawn"""
-        now = datetime.now(self.timezone)
+        if now is None:
+            now = datetime.now(next_spawn.tzinfo)
         if now >= next_spawn:
             return "NOW!"
 
@@ -220,151 +1270,1185 @@ class BossTimer:
 
         return fixed_time
 
-    def shorten_location(self, location: str) -> str:
+    def shorten_location(self, location: str, short_locations: Dict[str, str]) -> str:
         """Shorten long location names to save space"""
-        short_names = {
-            "Corrupted Basin": "CrptBasin",
-            "Crescent Lake": "CrescentLk",
-            "Ulan Canyon": "UlanCany",
-            "Protector's Ruins": "ProtRuins",
-            "Lower Tomb of Tyriosa 1F": "Tyriosa1F",
-            "Secret Laboratory": "SecretLab",
-            "Desert of the Screaming": "ScreamDst",
-            "Twilight Hill": "TwilightHl",
-            "Lower Tomb of Tyriosa 2F": "Tyriosa2F",
-            "Land of Glory": "GloryLand",
-            "Battlefield of Templar": "TemplarBF",
-            "Lower Tomb of Tyriosa 3F": "Tyriosa3F",
-            "Plateau of Revolution": "RevolPlat",
-            "Ruins of the War": "WarRuins",
-            "Garbana Underground Waterway 1F": "Garbana1F",
-            "Deadman's Land District 1": "Deadman1",
-            "Deadman's Land District 2": "Deadman2",
-            "Deadman's Land District 3": "Deadman3",
-            "Garbana Underground Waterway 2F": "Garbana2F"
-        }
-        return short_names.get(location, location[:10])
+        return short_locations.get(location, location[:10])
 
-    def shorten_boss_name(self, name: str) -> str:
+    def shorten_boss_name(self, boss: dict) -> str:
         """Shorten long boss names to save space"""
-        short_names = {
-            "Venatus": "Venatus",
-            "Viorent": "Viorent",
-            "Ego": "Ego",
-            "Clementis": "Clemnts",
-            "Livera": "Livera",
-            "Araneo": "Araneo",
-            "Undomiel": "Undomiel",
-            "Saphirus": "Saphirus",
-            "Neutro": "Neutro",
-            "Lady Dalia": "LadyDalia",
-            "Aquleus": "Aquleus",
-            "Thymele": "Thymele",
-            "Amentis": "Amentis",
-            "Baron": "Baron",
-            "Milavy": "Milavy",
-            "Wannitas": "Wannitas",
-            "Metus": "Metus",
-            "Duplican": "Duplican",
-            "Shuliar": "Shuliar",
-            "Ringor": "Ringor",
-            "Roderick": "Roderick",
-            "Gareth": "Gareth",
-            "Titore": "Titore",
-            "Larba": "Larba",
-            "Catena": "Catena",
-            "Auraq": "Auraq"
-        }
-        return short_names.get(name, name[:8])
-
-    async def generate_boss_table(self) -> str:
-        """Generate a formatted table of all bosses with timers first"""
-        async with aiosqlite.connect('boss_timer.db') as db:
-            cursor = await db.execute(
-                "SELECT boss_name, next_spawn FROM boss_kills WHERE id IN (SELECT MAX(id) FROM boss_kills GROUP BY boss_name)"
-            )
-            results = await cursor.fetchall()
+        return boss.get("short_name") or boss["name"][:8]
 
-        boss_times = {row[0]: datetime.fromisoformat(row[1]).astimezone(
-            self.timezone) if row[1] else None for row in results}
+    def compile_boss(self, boss: dict, short_locations: Dict[str, str]) -> "BossSchedule":
+        """Parse a roster entry into its schedule and display strings"""
+        hours, weekly_schedule = self.parse_fixed_time(boss["fixed_time"])
+        if hours:
+            interval = timedelta(hours=hours)
+        elif weekly_schedule:
+            interval = None
+        else:
+            interval = timedelta(hours=24)
+
+        short_name = self.shorten_boss_name(boss)
+        return BossSchedule(
+            name=boss["name"],
+            level=boss["level"],
+            armor=boss["armor"],
+            location=boss["location"],
+            fixed_time=boss["fixed_time"],
+            interval=interval,
+            weekly_slots=tuple(weekly_schedule or ()),
+            label=f"{short_name}({boss['level']})",
+            fixed_time_display=self.format_fixed_time_for_table(
+                boss["fixed_time"]),
+            short_location=self.shorten_location(boss["location"], short_locations),
+        )
 
-        # Separate bosses with timers and without
-        bosses_with_timers = []
-        bosses_without_timers = []
+    def apply_roster(self, data: dict) -> Tuple[List[str], List[str], List[str]]:
+        """Compile a roster and swap it in; returns added, removed and changed bosses
 
-        for boss_name, boss_data in self.bosses.items():
-            next_spawn = boss_times.get(boss_name)
-            if next_spawn:
-                time_left = self.format_time_left(next_spawn)
-            else:
-                time_left = "TBD"
-
-            short_boss_name = self.shorten_boss_name(boss_name)
-            boss_with_level = f"{short_boss_name}({boss_data['level']})"
-            short_location = self.shorten_location(boss_data["location"])
-            formatted_fixed_time = self.format_fixed_time_for_table(
-                boss_data["fixed_time"])
-
-            row = [
-                boss_with_level,
-                time_left,
-                formatted_fixed_time,
-                short_location
-            ]
-
-            if time_left != "TBD":
-                # Add the actual datetime for sorting
-                bosses_with_timers.append((next_spawn, row))
+        Unchanged bosses keep their compiled schedule and the name index is
+        only rebuilt when names or aliases change. Everything is replaced in
+        one step, so no command sees a mix of old and new data; an invalid
+        roster raises ValueError and replaces nothing.
+        """
+        try:
+            short_locations = dict(data.get("short_locations", {}))
+            bosses: Dict[str, dict] = {}
+            schedules: Dict[str, BossSchedule] = {}
+            aliases: Dict[str, str] = {}
+            changed = []
+            for boss in data["bosses"]:
+                name = boss["name"]
+                if name in bosses:
+                    raise ValueError(f"boss '{name}' is listed twice")
+                current = self.schedules.get(name)
+                if (current is not None and self.bosses[name] == boss and current.short_location
+                        == self.shorten_location(boss["location"], short_locations)):
+                    schedules[name] = current
+                else:
+                    schedules[name] = self.compile_boss(boss, short_locations)
+                    if current is not None:
+                        changed.append(name)
+                bosses[name] = boss
+                for alias in boss.get("aliases", ()):
+                    aliases[alias] = name
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"invalid boss roster: {e!r}") from e
+        if not schedules:
+            raise ValueError("the boss roster is empty")
+
+        resolver = self.resolver
+        if resolver is None or list(schedules) != list(self.schedules) or aliases != self.aliases:
+            resolver = BossNameResolver(schedules, aliases)
+        added = [name for name in schedules if name not in self.schedules]
+        removed = [name for name in self.schedules if name not in schedules]
+        self.bosses, self.schedules, self.aliases, self.resolver = bosses, schedules, aliases, resolver
+        self._layouts = {}
+        # Loaded guilds drop removed bosses in the same step; added ones
+        # appear once each guild is reloaded
+        if removed:
+            for state in self.guilds.values():
+                state.roster = tuple(name for name in state.roster if name in schedules)
+                for name in removed:
+                    state.next_spawns.pop(name, None)
+        return added, removed, changed
+
+    async def load_alert_channels(self):
+        """Load the channels subscribed to spawn alerts"""
+        results = await db.fetchall(SELECT_ALERT_CHANNELS_SQL)
+        self.alert_channels = {row[0]: row[1] for row in results if owns_guild(row[1], row[0])}
+
+    def cached_guild(self, guild_id: int) -> Optional[GuildState]:
+        """Return a guild's state only if it is already loaded"""
+        state = self.guilds.get(guild_id)
+        if state is not None:
+            state.last_used = time.monotonic()
+            self.guilds.move_to_end(guild_id)
+        return state
+
+    async def get_guild(self, guild_id: int) -> GuildState:
+        """Return a guild's state, loading it from the database on a miss"""
+        state = self.cached_guild(guild_id)
+        if state is not None:
+            self.guild_cache_hits += 1
+            return state
+
+        self.guild_cache_misses += 1
+        # Share one load between concurrent callers for the same guild
+        future = self._guild_loads.get(guild_id)
+        if future is None:
+            future = asyncio.ensure_future(self._load_guild(guild_id))
+            self._guild_loads[guild_id] = future
+            future.add_done_callback(
+                lambda _: self._guild_loads.pop(guild_id, None))
+        return await asyncio.shield(future)
+
+    async def _load_guild(self, guild_id: int) -> GuildState:
+        state = GuildState(guild_id, *await self._read_guild(guild_id))
+        self.guilds[guild_id] = state
+        self.evict_idle_guilds(keep=guild_id)
+        return state
+
+    async def _read_guild(self, guild_id: int) -> Tuple["pytz.BaseTzInfo", Tuple[str, ...], Dict[str, datetime]]:
+        """Read a guild's timezone, roster and next spawns"""
+        settings = await db.fetchone(SELECT_GUILD_SETTINGS_SQL, (guild_id,))
+        timezone_name, roster_json = settings if settings else (None, None)
+        timezone = pytz.timezone(timezone_name) if timezone_name else self.timezone
+        roster = tuple(self.schedules)
+        if roster_json:
+            wanted = set(json.loads(roster_json))
+            roster = tuple(name for name in roster if name in wanted)
+
+        results = await db.fetchall(LATEST_SPAWNS_SQL, (guild_id,))
+        next_spawns = {row[0]: datetime.fromtimestamp(row[1], timezone)
+                       for row in results if row[1] is not None and row[0] in self.schedules}
+        return timezone, roster, next_spawns
+
+    async def reload_guild(self, guild_id: int) -> Optional[List[str]]:
+        """Re-read a loaded guild in place; returns the bosses whose spawn moved
+
+        Returns None when the guild is not loaded. The state object is kept,
+        so commands holding it keep updating the cached copy.
+        """
+        state = self.guilds.get(guild_id)
+        if state is None:
+            return None
+        timezone, roster, next_spawns = await self._read_guild(guild_id)
+        # Whole seconds, as stored; a cached time can carry microseconds
+        moved = [name for name, next_spawn in next_spawns.items()
+                 if name not in state.next_spawns
+                 or int(state.next_spawns[name].timestamp()) != int(next_spawn.timestamp())]
+        state.timezone, state.roster, state.next_spawns = timezone, roster, next_spawns
+        return moved
+
+    def pinned_guilds(self) -> Set[int]:
+        """Guilds that must stay loaded for live tables and alerts"""
+        return set(self.live_channels.values()) | set(self.alert_channels.values())
+
+    def evict_idle_guilds(self, idle_seconds: Optional[float] = None, keep: Optional[int] = None):
+        """Drop least recently used guilds past the cache size or idle time"""
+        if idle_seconds is None:
+            idle_seconds = GUILD_CACHE_IDLE_SECONDS
+        pinned = self.pinned_guilds()
+        pinned.add(keep)
+        cutoff = time.monotonic() - idle_seconds
+        excess = len(self.guilds) - GUILD_CACHE_SIZE
+        for guild_id, state in list(self.guilds.items()):
+            if state.last_used > cutoff and excess <= 0:
+                break
+            if guild_id in pinned:
+                continue
+            del self.guilds[guild_id]
+            excess -= 1
+
+    async def set_timezone(self, state: GuildState, timezone):
+        """Change a guild's timezone; cached times are converted in place"""
+        await db.execute(UPSERT_GUILD_TIMEZONE_SQL, (state.guild_id, timezone.zone))
+        state.timezone = timezone
+        state.next_spawns = {name: next_spawn.astimezone(timezone)
+                             for name, next_spawn in state.next_spawns.items()}
+
+    async def set_roster(self, state: GuildState, roster: Optional[List[str]]):
+        """Change the bosses a guild tracks (None restores the full roster)"""
+        await db.execute(UPSERT_GUILD_ROSTER_SQL, (state.guild_id,
+                         json.dumps(roster) if roster is not None else None))
+        wanted = set(roster) if roster is not None else set(self.schedules)
+        state.roster = tuple(
+            name for name in self.schedules if name in wanted)
+
+    async def record_kill(self, state: GuildState, boss_name: str, kill_time: datetime, next_spawn: datetime,
+                          dedup_seconds: Optional[int] = None) -> bool:
+        """Store a kill and update the spawn cache once it is committed
+
+        Returns False when the report was merged into a near-simultaneous
+        report of the same boss, whose times are kept instead.
+        """
+        future, merged = kill_writes.submit(state.guild_id, boss_name, int(kill_time.timestamp()),
+                                            int(next_spawn.timestamp()), dedup_seconds)
+        # Shielded: merged reports share one future
+        stored = await asyncio.shield(future)
+        # Cached as stored, in whole seconds, so reloading the guild after
+        # this write finds nothing new
+        state.next_spawns[boss_name] = datetime.fromtimestamp(stored[1], state.timezone)
+        return not merged
+
+    def parse_kill_csv(self, text: str, timezone) -> Tuple[List[str], List[int], List[str]]:
+        """Read boss,kill_time rows exported as CSV
+
+        kill_time is epoch seconds or an ISO date and time, read in the
+        timezone when it has no offset. Kills in the future or before
+        IMPORT_EARLIEST_KILL_TS are skipped. Returns the boss names and kill
+        epochs, plus an error for every row that was skipped.
+        """
+        names: List[str] = []
+        kills: List[int] = []
+        errors: List[str] = []
+        resolved: Dict[str, Optional[str]] = {}
+        latest_ts = time.time() + IMPORT_CLOCK_SKEW_SECONDS
+        for line_number, row in enumerate(csv.reader(text.splitlines()), start=1):
+            if not row or not "".join(row).strip():
+                continue
+            if line_number == 1 and row[0].strip().lower() in ("boss", "boss_name", "name"):
+                continue
+            if len(row) < 2:
+                errors.append(f"line {line_number}: expected boss,kill_time")
+                continue
+            boss_text, time_text = row[0].strip(), row[1].strip()
+            if boss_text not in resolved:
+                resolved[boss_text] = self.find_boss_name(boss_text)
+            if not resolved[boss_text]:
+                errors.append(f"line {line_number}: unknown boss '{boss_text}'")
+                continue
+            try:
+                if time_text.isdigit():
+                    kill_ts = int(time_text)
+                else:
+                    kill_time = datetime.fromisoformat(time_text)
+                    if kill_time.tzinfo is None:
+                        kill_time = timezone.localize(kill_time)
+                    kill_ts = int(kill_time.timestamp())
+            except (ValueError, OverflowError):
+                errors.append(f"line {line_number}: invalid time '{time_text}'")
+                continue
+            if not IMPORT_EARLIEST_KILL_TS <= kill_ts <= latest_ts:
+                errors.append(f"line {line_number}: time '{time_text}' is not a past kill")
+                continue
+            names.append(resolved[boss_text])
+            kills.append(kill_ts)
+        return names, kills, errors
+
+    async def import_kills(self, state: GuildState, boss_names: Sequence[str], kill_ts: Sequence[int]) -> List[str]:
+        """Store many past kills in one transaction; returns bosses whose timer moved
+
+        Kills are inserted oldest first so the boss_state trigger ends on the
+        newest one, and a boss whose stored kill is newer than everything
+        imported keeps it.
+        """
+        spawn_ts = self.calculate_next_spawns(boss_names, kill_ts, state.timezone)
+        rows = sorted(zip(boss_names, kill_ts, spawn_ts), key=lambda row: row[1])
+        latest = {name: (kill, spawn) for name, kill, spawn in rows}
+        spawn_times = {name: datetime.fromtimestamp(spawn, state.timezone) for name, (_, spawn) in latest.items()}
+        async with db.writer() as conn:
+            started = time.perf_counter()
+            async with conn.execute(SELECT_BOSS_STATE_SQL, (state.guild_id,)) as cursor:
+                stored = {row[0]: row[1:] for row in await cursor.fetchall()}
+            await conn.executemany(INSERT_KILL_SQL, [
+                (state.guild_id, name, kill, spawn) for name, kill, spawn in rows])
+            kept = [name for name in latest
+                    if name in stored and stored[name][1] > latest[name][0]]
+            await conn.executemany(RESTORE_BOSS_STATE_SQL, [
+                (*stored[name], state.guild_id, name) for name in kept])
+        DB_WRITE_SECONDS.observe(time.perf_counter() - started)
+
+        moved = [name for name in latest if name not in kept]
+        for name in moved:
+            state.next_spawns[name] = spawn_times[name]
+        return moved
+
+    def has_imminent_spawn(self, state: GuildState, within: timedelta) -> bool:
+        """Check whether any boss spawns, or just spawned, within a window"""
+        now = datetime.now(state.timezone)
+        return any(now - within <= state.next_spawns[name] <= now + within
+                   for name in state.roster if name in state.next_spawns)
+
+    def boss_rows(self, state: GuildState) -> List[Tuple[str, str]]:
+        """(boss, time left) in table order: soonest spawn first, then TBD
+
+        Countdowns are counted from the start of the current minute, so every
+        cell changes at the same moment and a live table's body changes once
+        a minute instead of at each spawn's own second offset. NOW! is
+        checked against the exact time so it shows as soon as a boss is up.
+        """
+        now = datetime.now(state.timezone)
+        minute = now.replace(second=0, microsecond=0)
+        timed = []
+        untimed = []
+        for boss_name in state.roster:
+            # A guild read while the roster was being swapped may still
+            # list a removed boss until it is reloaded
+            if boss_name not in self.schedules:
+                continue
+            next_spawn = state.next_spawns.get(boss_name)
+            if next_spawn is None:
+                untimed.append((boss_name, "TBD"))
             else:
-                bosses_without_timers.append(row)
-
-        # Sort bosses with timers by next spawn time (soonest first)
-        bosses_with_timers.sort(key=lambda x: x[0])
-
-        # Extract just the rows without the datetime
-        sorted_bosses_with_timers = [
-            row for (next_spawn, row) in bosses_with_timers]
-
-        # Combine lists (timers first, then TBD bosses)
-        table_data = sorted_bosses_with_timers + bosses_without_timers
-
-        # Create table with headers
-        headers = ["Boss(Lvl)", "Time Left", "Fixed Time", "Location"]
-        table = tabulate(table_data, headers, tablefmt="simple")
-
-        # Add timestamp
-        timestamp = datetime.now(self.timezone).strftime(
+                time_left = "NOW!" if now >= next_spawn else self.format_time_left(next_spawn, minute)
+                timed.append((next_spawn, boss_name, time_left))
+        timed.sort(key=lambda row: row[0])
+        return [(boss_name, time_left) for _, boss_name, time_left in timed] + untimed
+
+    def table_layout(self, roster: Tuple[str, ...], time_width: int) -> "TableLayout":
+        """The precomputed columns of a roster's table, built on first use"""
+        key = (roster, time_width)
+        layout = self._layouts.get(key)
+        if layout is None:
+            if len(self._layouts) >= TABLE_LAYOUT_CACHE_SIZE:
+                self._layouts.clear()
+            layout = self._layouts[key] = TableLayout(
+                [self.schedules[name] for name in roster if name in self.schedules], time_width)
+        return layout
+
+    def render_boss_table(self, state: GuildState, table_format: str = "table") -> str:
+        """Render the boss table body (without the timestamp footer)
+
+        Only the Time Left cells change between renders; the other columns
+        come from the roster's cached layout.
+        """
+        rows = self.boss_rows(state)
+        longest = max((len(time_left) for _, time_left in rows), default=0)
+        layout = self.table_layout(state.roster, max(TIME_LEFT_MIN_WIDTH, longest))
+        if table_format == "compact":
+            return "\n".join(layout.compact_rows[name] + time_left.rjust(longest)
+                             for name, time_left in rows)
+        lines = [layout.header]
+        for name, time_left in rows:
+            prefix, suffix = layout.rows[name]
+            lines.append(prefix + time_left.ljust(layout.time_width) + suffix)
+        return "\n".join(lines)
+
+    def render_live_table(self, state: GuildState, table_format: str) -> str:
+        """Render a table body that fits one message, compacting it if needed"""
+        table = self.render_boss_table(state, table_format)
+        if len(table) > MESSAGE_LIMIT - TABLE_MESSAGE_OVERHEAD and table_format != "compact":
+            table = self.render_boss_table(state, "compact")
+        if len(table) > MESSAGE_LIMIT - TABLE_MESSAGE_OVERHEAD:
+            lines = table.split("\n")
+            kept = table[:MESSAGE_LIMIT - TABLE_MESSAGE_OVERHEAD - 20].count("\n")
+            table = "\n".join(lines[:kept]) + f"\n... {len(lines) - kept} more"
+        return table
+
+    def render_boss_embed(self, state: GuildState) -> discord.Embed:
+        """Render the boss timers as an embed"""
+        lines = []
+        for name, time_left in self.boss_rows(state):
+            schedule = self.schedules[name]
+            lines.append(f"`{time_left:>8}`  **{name}** ({schedule.level}) · {schedule.short_location}")
+        description = "\n".join(lines)
+        if len(description) > EMBED_DESCRIPTION_LIMIT:
+            description = description[:description.rfind("\n", 0, EMBED_DESCRIPTION_LIMIT - 20)]
+            description += f"\n... {len(lines) - description.count(chr(10)) - 1} more"
+        embed = discord.Embed(title="Boss Timers", description=description, color=0x00ff00)
+        timestamp = datetime.now(state.timezone).strftime("%Y-%m-%d %H:%M:%S %Z")
+        embed.set_footer(text=f"Last updated: {timestamp}")
+        return embed
+
+    def format_table_message(self, state: GuildState, table: str) -> str:
+        """Wrap a rendered table in a code block with a timestamp"""
+        timestamp = datetime.now(state.timezone).strftime(
             "%Y-%m-%d %H:%M:%S %Z")
 
         return f"```\n{table}\n\nLast updated: {timestamp}\n```"
 
+    def format_table_messages(self, state: GuildState, table: str, table_format: str = "table") -> List[str]:
+        """Wrap a table in code blocks that each fit in one message
+
+        A long table is split between rows; every part repeats the header
+        and the last one carries the timestamp.
+        """
+        message = self.format_table_message(state, table)
+        if len(message) <= MESSAGE_LIMIT:
+            return [message]
+
+        footer = message[len(f"```\n{table}"):]
+        lines = table.split("\n")
+        header = lines[:2] if table_format == "table" else []
+        messages = []
+        part = list(header)
+        size = sum(len(line) + 1 for line in part)
+        for line in lines[len(header):]:
+            if part[len(header):] and size + len(line) + len(footer) + 4 > MESSAGE_LIMIT:
+                messages.append("```\n" + "\n".join(part) + "\n```")
+                part = list(header)
+                size = sum(len(line) + 1 for line in part)
+            part.append(line)
+            size += len(line) + 1
+        messages.append("```\n" + "\n".join(part) + footer)
+        return messages
+
+    def generate_boss_table(self, state: GuildState, table_format: str = "table") -> List[str]:
+        """Generate the boss table messages, timers first"""
+        return self.format_table_messages(
+            state, self.render_boss_table(state, table_format), table_format)
+
+    def cached_boss_table(self, state: GuildState, table_format: str) -> Union[List[str], discord.Embed]:
+        """A guild's !bosslist reply, reused for RENDER_CACHE_SECONDS"""
+        key = (state.guild_id, table_format)
+        now = time.monotonic()
+        cached = self.render_cache.get(key)
+        if cached is not None and cached[0] > now:
+            RENDER_CACHE_HITS.inc()
+            return cached[1]
+        if table_format == "embed":
+            rendered = self.render_boss_embed(state)
+        else:
+            rendered = self.generate_boss_table(state, table_format)
+        self.render_cache[key] = (now + RENDER_CACHE_SECONDS, rendered)
+        return rendered
+
+    def invalidate_renders(self, guild_id: Optional[int] = None):
+        """Drop cached !bosslist replies of a guild, or of every guild"""
+        if guild_id is None:
+            self.render_cache.clear()
+            return
+        for table_format in TABLE_FORMATS:
+            self.render_cache.pop((guild_id, table_format), None)
+
+    def prune_renders(self):
+        """Drop cached !bosslist replies that have expired"""
+        now = time.monotonic()
+        for key, (expires, _) in list(self.render_cache.items()):
+            if expires <= now:
+                del self.render_cache[key]
+
 
 # Initialize boss timer
 boss_timer = BossTimer()
 
 
+# Discord allows roughly 50 requests per second globally and 5 message
+# edits per 5 seconds in a single channel
+DISCORD_GLOBAL_RATE = (50, 1.0)
+# The global limit is per bot token, so processes running part of the
+# shards each get a share in proportion to their shards
+SHARD_SHARE = len(SHARD_IDS) / SHARD_COUNT if SHARD_COUNT and SHARD_IDS else 1.0
+PROCESS_GLOBAL_RATE = (max(1, int(DISCORD_GLOBAL_RATE[0] * SHARD_SHARE)), DISCORD_GLOBAL_RATE[1])
+LIVE_EDIT_ROUTE_RATE = (5, 5.0)
+# Backoff after a rate limited edit, doubled on each consecutive hit
+LIVE_EDIT_BACKOFF_SECONDS = 2.0
+LIVE_EDIT_MAX_BACKOFF_SECONDS = 60.0
+
+# Live edit priorities (lower is sent first)
+PRIORITY_URGENT = 0
+PRIORITY_ROUTINE = 1
+
+
+class TokenBucket:
+    """Token bucket that can also be blocked until a given time"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated", "blocked_until")
+
+    def __init__(self, capacity: int, per: float):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Seconds until a token can be taken"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self, now: Optional[float] = None):
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until,
+                                 time.monotonic() + seconds)
+
+
+class LiveEditScheduler:
+    """Send live table edits within Discord's rate limits
+
+    Pending edits are coalesced per channel, so only the newest content for a
+    message is ever sent, and urgent edits jump ahead of routine refreshes.
+    """
+
+    def __init__(self, send: Callable[[int, str, int], Awaitable[None]], workers: int):
+        self.send = send
+        self.worker_count = workers
+        self.global_bucket = TokenBucket(*PROCESS_GLOBAL_RATE)
+        self.route_buckets: Dict[int, TokenBucket] = {}
+        self.backoff: Dict[int, float] = {}
+        # channel id -> (priority, content, content hash)
+        self._pending: Dict[int, Tuple[int, str, int]] = {}
+        self._inflight: Set[int] = set()
+        self._heap: List[Tuple[int, int, int]] = []
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        if self.is_running:
+            return
+        self._workers = [asyncio.create_task(self._worker())
+                         for _ in range(self.worker_count)]
+
+    async def stop(self):
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def submit(self, channel_id: int, content: str, content_hash: int, priority: int = PRIORITY_ROUTINE):
+        """Queue an edit, replacing any pending edit for the same channel"""
+        current = self._pending.get(channel_id)
+        if current is not None:
+            priority = min(priority, current[0])
+        self._pending[channel_id] = (priority, content, content_hash)
+        if current is None or priority < current[0]:
+            self._push(channel_id, priority)
+
+    def discard(self, channel_id: int):
+        """Drop any pending edit and rate limit state for a channel"""
+        self._pending.pop(channel_id, None)
+        self.route_buckets.pop(channel_id, None)
+        self.backoff.pop(channel_id, None)
+
+    def _push(self, channel_id: int, priority: int):
+        self._seq += 1
+        heapq.heappush(self._heap, (priority, self._seq, channel_id))
+        self._wakeup.set()
+
+    def _requeue(self, channel_id: int):
+        pending = self._pending.get(channel_id)
+        if pending is not None:
+            self._push(channel_id, pending[0])
+
+    def _route_bucket(self, channel_id: int) -> TokenBucket:
+        bucket = self.route_buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.route_buckets[channel_id] = TokenBucket(
+                *LIVE_EDIT_ROUTE_RATE)
+        return bucket
+
+    async def _next(self) -> Tuple[int, Tuple[int, str, int]]:
+        """Wait for the most urgent edit that may be sent right now"""
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            priority, _, channel_id = heapq.heappop(self._heap)
+            pending = self._pending.get(channel_id)
+            # Entries are removed lazily; skip ones that were superseded
+            if pending is None or pending[0] != priority or channel_id in self._inflight:
+                continue
+
+            delay = self._route_bucket(channel_id).delay()
+            if delay > 0:
+                loop.call_later(delay, self._requeue, channel_id)
+                continue
+
+            del self._pending[channel_id]
+            return channel_id, pending
+
+    async def _worker(self):
+        while True:
+            channel_id, pending = await self._next()
+            self._inflight.add(channel_id)
+            try:
+                while (delay := self.global_bucket.delay()) > 0:
+                    await asyncio.sleep(delay)
+                self.global_bucket.consume()
+                self._route_bucket(channel_id).consume()
+                await self._send(channel_id, pending)
+            finally:
+                self._inflight.discard(channel_id)
+                # Content submitted while this edit was in flight
+                self._requeue(channel_id)
+
+    async def _send(self, channel_id: int, pending: Tuple[int, str, int]):
+        priority, content, content_hash = pending
+        started = time.perf_counter()
+        try:
+            await self.send(channel_id, content, content_hash)
+        except (discord.RateLimited, discord.HTTPException) as e:
+            if isinstance(e, discord.HTTPException) and e.status != 429:
+                EDIT_ERRORS.inc()
+                log_event(logging.WARNING, "live_edit_failed",
+                          channel_id=channel_id, status=e.status, error=e)
+                return
+            backoff = min(self.backoff.get(channel_id, LIVE_EDIT_BACKOFF_SECONDS / 2) * 2,
+                          LIVE_EDIT_MAX_BACKOFF_SECONDS)
+            self.backoff[channel_id] = backoff
+            retry_after = getattr(e, "retry_after", None) or 0
+            self._route_bucket(channel_id).block(max(backoff, retry_after))
+            log_event(logging.WARNING, "live_edit_rate_limited",
+                      channel_id=channel_id, backoff=float(max(backoff, retry_after)))
+            # Retry unless newer content has been queued meanwhile
+            if channel_id not in self._pending:
+                self._pending[channel_id] = pending
+        except Exception as e:
+            EDIT_ERRORS.inc()
+            log_event(logging.WARNING, "live_edit_failed",
+                      channel_id=channel_id, error=e)
+        else:
+            EDIT_SECONDS.observe(time.perf_counter() - started)
+            self.backoff.pop(channel_id, None)
+
+
+class SpawnAlertScheduler:
+    """Fire spawn alerts exactly when they are due
+
+    Alerts sit in a min-heap ordered by due time and a single task sleeps
+    until the earliest one. Rescheduling a boss bumps its generation and
+    pushes new entries, so older entries are skipped when they surface.
+    """
+
+    def __init__(self, notify: Callable[[Tuple[int, str], datetime, int], Awaitable[None]], leads: Tuple[int, ...]):
+        self.notify = notify
+        # Minutes before the spawn to alert at; 0 is the spawn itself
+        self.leads = tuple(sorted(set(leads) | {0}, reverse=True))
+        # (due timestamp, seq, (guild id, boss name), generation, lead, spawn)
+        self._heap: List[Tuple[float, int, Tuple[int, str], int, int, datetime]] = []
+        self._generations: Dict[Tuple[int, str], int] = {}
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def schedule(self, key: Tuple[int, str], next_spawn: datetime):
+        """Replace the pending alerts of a (guild, boss) with ones for next_spawn"""
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+        now = time.time()
+        for lead in self.leads:
+            due = (next_spawn - timedelta(minutes=lead)).timestamp()
+            if due <= now:
+                continue
+            self._seq += 1
+            heapq.heappush(self._heap, (due, self._seq, key,
+                                        generation, lead, next_spawn))
+        # Stale entries are only dropped when popped; rebuild if they pile up
+        if len(self._heap) > 4 * len(self.leads) * len(self._generations):
+            self._heap = [entry for entry in self._heap
+                          if self._generations.get(entry[2]) == entry[3]]
+            heapq.heapify(self._heap)
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, _, key, generation, lead, next_spawn = self._heap[0]
+            if self._generations.get(key) != generation:
+                heapq.heappop(self._heap)
+                continue
+
+            delay = due - time.time()
+            if delay > 0:
+                # Sleep until due, or until an earlier alert is scheduled
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            task = asyncio.create_task(
+                self.notify(key, next_spawn, lead))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+
+# Seconds between event loop lag samples, and how long each sample sleeps
+LOOP_LAG_INTERVAL = 1.0
+LOOP_LAG_SAMPLE = 0.5
+
+
+@tasks.loop(seconds=LOOP_LAG_INTERVAL)
+async def measure_loop_lag():
+    """Measure how late the event loop wakes a sleeping task"""
+    started = time.monotonic()
+    await asyncio.sleep(LOOP_LAG_SAMPLE)
+    LOOP_LAG.set(max(0.0, time.monotonic() - started - LOOP_LAG_SAMPLE))
+
+
 @bot.event
 async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
-    await init_db()
-    update_boss_timers.start()
+    global _change_seq
+    log_event(logging.INFO, "ready", user=bot.user, guilds=len(bot.guilds),
+              shards=",".join(map(str, sorted(bot.shards))), shard_count=bot.shard_count)
+    if not sync_guild_changes.is_running():
+        # Guilds loaded from here on are current; only later changes matter
+        _change_seq = (await db.fetchone(LATEST_CHANGE_SQL))[0]
+        sync_guild_changes.start()
+    await boss_timer.load_alert_channels()
+    live_edits.start()
+    for guild_id in set(boss_timer.alert_channels.values()):
+        schedule_guild_alerts(await boss_timer.get_guild(guild_id))
+    spawn_alerts.start()
+    if not update_boss_timers.is_running():
+        update_boss_timers.start()
+    if runs_maintenance() and not maintain_db.is_running():
+        maintain_db.start()
+    if not measure_loop_lag.is_running():
+        measure_loop_lag.start()
+    if not watch_roster_file.is_running():
+        watch_roster_file.start()
+    await restore_live_messages()
+
+
+# Seconds between live table refreshes
+LIVE_UPDATE_SECONDS = 5
+# Refresh once a minute on the minute instead; the timers only have minute
+# resolution, so this trades up to a minute of staleness for far fewer ticks
+LIVE_ALIGN_TO_MINUTE = os.environ.get(
+    "LIVE_ALIGN_TO_MINUTE", "").lower() in ("1", "true", "yes")
+# Number of live message edits in flight at once
+LIVE_EDIT_CONCURRENCY = 8
+# Refreshes are urgent while a boss spawns within this window
+IMMINENT_SPAWN_WINDOW = timedelta(minutes=10)
+
+
+def guild_key(ctx) -> int:
+    """Guild whose timers a command uses; each DM channel stands alone"""
+    return ctx.guild.id if ctx.guild else ctx.channel.id
+
+
+# Commands allowed as (burst, per seconds) for each user, channel and guild.
+# The channel limit matches what Discord lets the bot post there
+COMMAND_USER_RATE = (5, 10.0)
+COMMAND_CHANNEL_RATE = (10, 10.0)
+COMMAND_GUILD_RATE = (30, 10.0)
+
+
+class CommandThrottled(commands.CheckFailure):
+    """A command was rejected by a CommandThrottle limit"""
+
+    def __init__(self, scope: str, retry_after: float, notify: bool):
+        super().__init__(f"{scope} command limit reached")
+        self.scope = scope
+        self.retry_after = retry_after
+        # Only the first rejection of a burst gets a reply
+        self.notify = notify
+
+
+class CommandThrottle:
+    """Token buckets per user, channel and guild in front of every command
+
+    A command runs only when all three of its buckets have a token, and
+    then takes one from each, so rejected commands cost nothing. Buckets
+    that have refilled are dropped by prune().
+    """
+
+    def __init__(self, user_rate: Tuple[int, float], channel_rate: Tuple[int, float],
+                 guild_rate: Tuple[int, float]):
+        self.rates = {"user": user_rate, "channel": channel_rate, "guild": guild_rate}
+        # (scope, id) -> bucket
+        self.buckets: Dict[Tuple[str, int], TokenBucket] = {}
+        # (scope, id) of an empty bucket -> monotonic time until which its
+        # rejections stay silent, so a full channel gets one notice, not one
+        # per user
+        self.warned_until: Dict[Tuple[str, int], float] = {}
+
+    def _bucket(self, scope: str, key: int) -> TokenBucket:
+        bucket = self.buckets.get((scope, key))
+        if bucket is None:
+            bucket = self.buckets[(scope, key)] = TokenBucket(*self.rates[scope])
+        return bucket
+
+    def acquire(self, user_id: int, channel_id: int, guild_id: int):
+        """Take a token for a command, or raise CommandThrottled"""
+        now = time.monotonic()
+        buckets = [((scope, key), self._bucket(scope, key)) for scope, key in
+                   (("user", user_id), ("channel", channel_id), ("guild", guild_id))]
+        for bucket_key, bucket in buckets:
+            retry_after = bucket.delay(now)
+            if retry_after > 0:
+                COMMANDS_THROTTLED.inc()
+                notify = self.warned_until.get(bucket_key, 0.0) <= now
+                if notify:
+                    self.warned_until[bucket_key] = now + retry_after
+                raise CommandThrottled(bucket_key[0], retry_after, notify)
+        for _, bucket in buckets:
+            bucket.consume(now)
+
+    def prune(self):
+        """Forget buckets that are full again and expired warnings"""
+        now = time.monotonic()
+        for key, bucket in list(self.buckets.items()):
+            if bucket.delay(now) == 0 and bucket.tokens >= bucket.capacity:
+                del self.buckets[key]
+        for bucket_key, until in list(self.warned_until.items()):
+            if until <= now:
+                del self.warned_until[bucket_key]
+
+
+command_throttle = CommandThrottle(COMMAND_USER_RATE, COMMAND_CHANNEL_RATE, COMMAND_GUILD_RATE)
+
+
+@bot.check
+async def throttle_commands(ctx) -> bool:
+    """Apply the per user, channel and guild command limits"""
+    command_throttle.acquire(ctx.author.id, ctx.channel.id, guild_key(ctx))
+    return True
+
+
+@bot.event
+async def on_command_error(ctx, error):
+    if isinstance(error, CommandThrottled):
+        if error.notify:
+            who = ctx.author.display_name if error.scope == "user" else f"this {error.scope}"
+            await ctx.send(f"Too many commands from {who}; try again in "
+                           f"{math.ceil(error.retry_after)}s.")
+        return
+    if isinstance(error, (commands.NotOwner, commands.MissingPermissions)):
+        await ctx.send(str(error))
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)
+
+
+# Stored live messages validated at once during the startup sweep
+LIVE_RESTORE_CONCURRENCY = 16
+
+
+def attach_live_message(channel_id: int, guild_id: int, message: discord.PartialMessage,
+                        table_format: str = "table"):
+    """Start keeping a channel's live message up to date"""
+    boss_timer.live_messages[channel_id] = message
+    boss_timer.live_channels[channel_id] = guild_id
+    if table_format == "table":
+        boss_timer.live_formats.pop(channel_id, None)
+    else:
+        boss_timer.live_formats[channel_id] = table_format
+
+
+async def stop_live_message(channel_id: int):
+    """Forget the live message of a channel"""
+    boss_timer.live_messages.pop(channel_id, None)
+    boss_timer.live_channels.pop(channel_id, None)
+    boss_timer.live_formats.pop(channel_id, None)
+    boss_timer.live_hashes.pop(channel_id, None)
+    live_edits.discard(channel_id)
+    await db.execute(DELETE_LIVE_MESSAGE_SQL, (channel_id,))
+
+
+async def resolve_live_message(channel_id: int, message_id: int) -> Optional[discord.PartialMessage]:
+    """Look a live message up again after an edit reported it missing"""
+    try:
+        channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+        message = await channel.fetch_message(message_id)
+    except (discord.NotFound, discord.Forbidden):
+        return None
+    return channel.get_partial_message(message.id)
 
 
-@tasks.loop(seconds=5)
+async def edit_live_message(channel_id: int, table_text: str, table_hash: int):
+    """Edit one live boss timer message"""
+    message = boss_timer.live_messages.get(channel_id)
+    if message is None:
+        return
+    try:
+        await message.edit(content=table_text)
+    except discord.NotFound:
+        resolved = await resolve_live_message(channel_id, message.id)
+        if boss_timer.live_messages.get(channel_id) is not message:
+            return
+        if resolved is None:
+            await stop_live_message(channel_id)
+            return
+        boss_timer.live_messages[channel_id] = resolved
+        await resolved.edit(content=table_text)
+    if channel_id in boss_timer.live_messages:
+        boss_timer.live_hashes[channel_id] = table_hash
+
+
+live_edits = LiveEditScheduler(edit_live_message, LIVE_EDIT_CONCURRENCY)
+
+
+async def restore_live_messages():
+    """Reattach to the live tables stored before a restart
+
+    Every stored message is checked with a bounded number of lookups in
+    flight; deleted messages and channels the bot lost access to are
+    dropped. Lookups that fail for other reasons keep the table, since a
+    later edit reports a missing message anyway.
+    """
+    rows = await db.fetchall(SELECT_LIVE_MESSAGES_SQL)
+    semaphore = asyncio.Semaphore(LIVE_RESTORE_CONCURRENCY)
+    started = time.perf_counter()
+    restored = dropped = 0
+
+    async def restore(channel_id: int, guild_id: int, message_id: int, table_format: str):
+        nonlocal restored, dropped
+        async with semaphore:
+            try:
+                message = await resolve_live_message(channel_id, message_id)
+            except Exception as e:
+                log_event(logging.WARNING, "live_restore_failed",
+                          channel_id=channel_id, error=e)
+                message = bot.get_partial_messageable(channel_id).get_partial_message(message_id)
+        if message is None:
+            dropped += 1
+            await db.execute(DELETE_LIVE_MESSAGE_SQL, (channel_id,))
+            return
+        # Load the guild before attaching so the eviction pass keeps it
+        await boss_timer.get_guild(guild_id)
+        attach_live_message(channel_id, guild_id, message, table_format)
+        restored += 1
+
+    await asyncio.gather(*(restore(*row) for row in rows
+                           if row[0] not in boss_timer.live_messages and owns_guild(row[1], row[0])))
+    log_event(logging.INFO, "live_messages_restored", restored=restored,
+              dropped=dropped, duration=time.perf_counter() - started)
+    refresh_live_tables()
+
+
+def refresh_live_tables(guild_id: Optional[int] = None, priority: Optional[int] = None):
+    """Queue an edit for every live table whose content has changed
+
+    Without a priority, a guild's edits are urgent while one of its bosses
+    is about to spawn and routine otherwise.
+    """
+    # Every change to a guild's tables comes through here
+    if guild_id is not None:
+        boss_timer.invalidate_renders(guild_id)
+
+    channels_by_guild: Dict[int, List[int]] = {}
+    for channel_id, channel_guild in boss_timer.live_channels.items():
+        if guild_id is None or channel_guild == guild_id:
+            channels_by_guild.setdefault(channel_guild, []).append(channel_id)
+
+    live_formats = boss_timer.live_formats
+    for channel_guild, channel_ids in channels_by_guild.items():
+        state = boss_timer.cached_guild(channel_guild)
+        if state is None:
+            continue
+        guild_priority = priority
+        if guild_priority is None:
+            imminent = boss_timer.has_imminent_spawn(
+                state, IMMINENT_SPAWN_WINDOW)
+            guild_priority = PRIORITY_URGENT if imminent else PRIORITY_ROUTINE
+
+        # The table is the same for every channel of a guild using the same
+        # format, so each format is rendered once
+        rendered: Dict[str, Tuple[str, int, Optional[str]]] = {}
+        for channel_id in channel_ids:
+            table_format = live_formats.get(channel_id, "table")
+            entry = rendered.get(table_format)
+            if entry is None:
+                render_started = time.perf_counter()
+                table = boss_timer.render_live_table(state, table_format)
+                RENDER_SECONDS.observe(time.perf_counter() - render_started)
+                entry = rendered[table_format] = (table, hash(table), None)
+            table, table_hash, table_text = entry
+            # Only the timestamp changes between most ticks; skip those edits
+            if boss_timer.live_hashes.get(channel_id) == table_hash:
+                continue
+            if table_text is None:
+                table_text = boss_timer.format_table_message(state, table)
+                rendered[table_format] = (table, table_hash, table_text)
+            live_edits.submit(channel_id, table_text,
+                              table_hash, guild_priority)
+
+
+LIVE_TICK_SECONDS = 60 if LIVE_ALIGN_TO_MINUTE else LIVE_UPDATE_SECONDS
+_last_tick_started: Optional[float] = None
+
+
+@tasks.loop(seconds=LIVE_TICK_SECONDS)
 async def update_boss_timers():
     """Update all live boss timer messages"""
-    for channel_id, message_id in boss_timer.live_messages.items():
+    global _last_tick_started
+    started = time.perf_counter()
+    gap = started - _last_tick_started if _last_tick_started else LIVE_TICK_SECONDS
+    _last_tick_started = started
+
+    try:
+        refresh_live_tables()
+        boss_timer.evict_idle_guilds()
+        boss_timer.prune_renders()
+        command_throttle.prune()
+    except Exception as e:
+        # An error escaping the loop would stop every live table for good
+        TICK_ERRORS.inc()
+        log_event(logging.ERROR, "live_tick_failed", error=e)
+
+    duration = time.perf_counter() - started
+    TICK_SECONDS.observe(duration)
+    # A tick overruns when it takes longer than its interval, or starts so
+    # late that a whole interval was skipped
+    if duration > LIVE_TICK_SECONDS or gap > 1.5 * LIVE_TICK_SECONDS:
+        TICK_OVERRUNS.inc()
+        log_event(logging.WARNING, "live_tick_overrun", duration=duration,
+                  gap=gap, live_channels=len(boss_timer.live_messages))
+
+
+@update_boss_timers.before_loop
+async def align_boss_timers():
+    """Start the first tick on a minute boundary when aligned"""
+    if LIVE_ALIGN_TO_MINUTE:
+        now = datetime.now()
+        await asyncio.sleep(60 - now.second - now.microsecond / 1_000_000)
+
+
+# Minutes before a spawn at which subscribed channels are alerted
+SPAWN_ALERT_MINUTES = tuple(
+    int(minutes) for minutes in os.environ.get("SPAWN_ALERT_MINUTES", "5").split(",") if minutes.strip())
+
+
+async def send_spawn_alert(key: Tuple[int, str], next_spawn: datetime, lead: int):
+    """Post a spawn alert to every subscribed channel of the guild"""
+    guild_id, boss_name = key
+    schedule = boss_timer.schedules.get(boss_name)
+    if schedule is None:
+        # Removed from the roster since the alert was scheduled
+        return
+    location = schedule.location
+    if lead:
+        text = f"⏰ **{boss_name}** spawns in {lead} min ({location})."
+    else:
+        text = f"🔔 **{boss_name}** has spawned! ({location})"
+        # Show NOW! in the live tables straight away
+        refresh_live_tables(guild_id, PRIORITY_URGENT)
+
+    async def send(channel_id: int):
         try:
-            channel = bot.get_channel(channel_id)
-            if channel:
-                message = await channel.fetch_message(message_id)
-                table_text = await boss_timer.generate_boss_table()
-                await message.edit(content=table_text)
-        except discord.NotFound:
-            if channel_id in boss_timer.live_messages:
-                del boss_timer.live_messages[channel_id]
+            channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+            await channel.send(text)
+        except (discord.NotFound, discord.Forbidden):
+            boss_timer.alert_channels.pop(channel_id, None)
+            await db.execute(DELETE_ALERT_CHANNEL_SQL, (channel_id,))
         except Exception as e:
-            print(f"Error updating message: {e}")
+            log_event(logging.WARNING, "spawn_alert_failed",
+                      channel_id=channel_id, boss=boss_name, error=e)
+
+    await asyncio.gather(*(
+        send(channel_id)
+        for channel_id, channel_guild in list(boss_timer.alert_channels.items())
+        if channel_guild == guild_id
+    ))
+
+
+spawn_alerts = SpawnAlertScheduler(send_spawn_alert, SPAWN_ALERT_MINUTES)
+
+
+def schedule_guild_alerts(state: GuildState):
+    """Schedule alerts for every known spawn of a guild"""
+    for boss_name, next_spawn in state.next_spawns.items():
+        spawn_alerts.schedule((state.guild_id, boss_name), next_spawn)
+
+
+def spawn_changed(state: GuildState, boss_name: str, next_spawn: datetime):
+    """Propagate a newly recorded spawn to alerts and live tables"""
+    if state.guild_id in boss_timer.alert_channels.values():
+        spawn_alerts.schedule((state.guild_id, boss_name), next_spawn)
+    refresh_live_tables(state.guild_id, PRIORITY_URGENT)
+
+
+async def reload_guild_timers(guild_id: int):
+    """Re-read a loaded guild and pass moved spawns to alerts and live tables"""
+    moved = await boss_timer.reload_guild(guild_id)
+    state = boss_timer.guilds.get(guild_id)
+    if moved is None or state is None:
+        return
+    if guild_id in boss_timer.alert_channels.values():
+        for boss_name in moved:
+            spawn_alerts.schedule((guild_id, boss_name), state.next_spawns[boss_name])
+    refresh_live_tables(guild_id)
+
+
+# Hours between database maintenance runs
+MAINTENANCE_INTERVAL_HOURS = 6
+
+
+@tasks.loop(hours=MAINTENANCE_INTERVAL_HOURS)
+async def maintain_db():
+    """Archive old kill history and compact the database"""
+    try:
+        cutoff = datetime.now() - timedelta(days=KILL_RETENTION_DAYS)
+        moved = await archive_old_kills(int(cutoff.timestamp()))
+        reclaimed = await compact_db()
+        log_event(logging.INFO, "db_maintenance", archived_rows=moved,
+                  reclaimed_bytes=reclaimed)
+    except Exception as e:
+        log_event(logging.ERROR, "db_maintenance_failed", error=e)
+
+
+# Seconds between polls for guilds changed by other bot processes
+CHANGE_POLL_SECONDS = 2
+_change_seq = 0
+
+
+@tasks.loop(seconds=CHANGE_POLL_SECONDS)
+async def sync_guild_changes():
+    """Reload loaded guilds whose kills or settings another process changed
+
+    This process's own writes show up too; reloading them finds nothing new.
+    """
+    global _change_seq
+    try:
+        changes = await db.fetchall(SELECT_CHANGES_SQL, (_change_seq,))
+        for seq, guild_id in changes:
+            _change_seq = seq
+            await reload_guild_timers(guild_id)
+    except Exception as e:
+        log_event(logging.ERROR, "guild_sync_failed", error=e)
+
+
+# Seconds between checks of the roster file for changes
+ROSTER_WATCH_SECONDS = 5
+_roster_mtime: Optional[float] = None
+
+
+async def reload_roster() -> Tuple[List[str], List[str], List[str]]:
+    """Apply the roster file without a restart; returns added, removed and changed bosses"""
+    global _roster_mtime
+    _roster_mtime = os.stat(BOSS_DATA_PATH).st_mtime
+    added, removed, changed = boss_timer.apply_roster(read_roster_file(BOSS_DATA_PATH))
+    # Rosters and spawns of loaded guilds follow the new boss list
+    for guild_id in list(boss_timer.guilds):
+        await reload_guild_timers(guild_id)
+    boss_timer.invalidate_renders()
+    refresh_live_tables()
+    log_event(logging.INFO, "roster_reloaded", bosses=len(boss_timer.schedules),
+              added=len(added), removed=len(removed), changed=len(changed))
+    return added, removed, changed
+
+
+@tasks.loop(seconds=ROSTER_WATCH_SECONDS)
+async def watch_roster_file():
+    """Reload the roster when its file is modified"""
+    global _roster_mtime
+    try:
+        mtime = os.stat(BOSS_DATA_PATH).st_mtime
+        if _roster_mtime is None:
+            _roster_mtime = mtime
+        elif mtime != _roster_mtime:
+            await reload_roster()
+    except Exception as e:
+        log_event(logging.ERROR, "roster_reload_failed", path=BOSS_DATA_PATH, error=e)
+
+
+@maintain_db.before_loop
+async def delay_maintenance():
+    """Leave startup to the gateway and live tables before maintaining"""
+    await asyncio.sleep(60)
 
 
 @bot.command(name='boss')
@@ -373,25 +2457,20 @@ async def boss_info(ctx, *, boss_name: str):
     # Use our flexible boss name finder
     actual_boss_name = boss_timer.find_boss_name(boss_name)
     if not actual_boss_name:
-        await ctx.send(f"Boss '{boss_name}' not found.")
+        await ctx.send(boss_timer.boss_not_found_message(boss_name))
         return
 
     boss = boss_timer.bosses[actual_boss_name]
+    state = await boss_timer.get_guild(guild_key(ctx))
 
-    async with aiosqlite.connect('boss_timer.db') as db:
-        cursor = await db.execute(
-            "SELECT kill_time, next_spawn FROM boss_kills WHERE boss_name = ? ORDER BY kill_time DESC LIMIT 1",
-            (actual_boss_name,)
-        )
-        result = await cursor.fetchone()
+    result = await db.fetchone(LATEST_KILL_SQL, (state.guild_id, actual_boss_name))
 
     if result:
-        kill_time, next_spawn_str = result
-        next_spawn = datetime.fromisoformat(
-            next_spawn_str).astimezone(boss_timer.timezone)
+        kill_ts, spawn_ts = result
+        next_spawn = datetime.fromtimestamp(spawn_ts, state.timezone)
         time_left = boss_timer.format_time_left(next_spawn)
-        kill_time_display = datetime.fromisoformat(
-            kill_time).astimezone(boss_timer.timezone).strftime('%H:%M')
+        kill_time_display = datetime.fromtimestamp(
+            kill_ts, state.timezone).strftime('%H:%M')
     else:
         time_left = "TBD"
         kill_time_display = "N/A"
@@ -409,24 +2488,56 @@ async def boss_info(ctx, *, boss_name: str):
 
 
 @bot.command(name='bosslist')
-async def boss_list(ctx):
+async def boss_list(ctx, table_format: str = "table"):
     """Display the current boss timer table"""
+    table_format = table_format.lower()
+    if table_format not in TABLE_FORMATS:
+        await ctx.send(f"Unknown format. Use one of: {', '.join(TABLE_FORMATS)}")
+        return
     try:
-        table_text = await boss_timer.generate_boss_table()
-        await ctx.send(table_text)
+        state = await boss_timer.get_guild(guild_key(ctx))
+        rendered = boss_timer.cached_boss_table(state, table_format)
+        if table_format == "embed":
+            await ctx.send(embed=rendered)
+            return
+        for table_text in rendered:
+            await ctx.send(table_text)
     except Exception as e:
         await ctx.send(f"Error generating boss list: {e}")
 
 
 @bot.command(name='livebosses')
-async def live_bosses(ctx):
+async def live_bosses(ctx, table_format: str = "table"):
     """Start live updating boss timer table in this channel"""
+    table_format = table_format.lower()
+    if table_format not in LIVE_TABLE_FORMATS:
+        await ctx.send(f"Unknown format. Live tables support: {', '.join(LIVE_TABLE_FORMATS)}")
+        return
+    existing = boss_timer.live_messages.get(ctx.channel.id)
+    if existing is not None:
+        # Running it again only changes the format of the current message
+        guild_id = boss_timer.live_channels[ctx.channel.id]
+        if boss_timer.live_formats.get(ctx.channel.id, "table") == table_format:
+            await ctx.send("A live boss timer is already running in this channel.")
+            return
+        await db.execute(INSERT_LIVE_MESSAGE_SQL,
+                         (ctx.channel.id, guild_id, existing.id, table_format))
+        attach_live_message(ctx.channel.id, guild_id, existing, table_format)
+        boss_timer.live_hashes.pop(ctx.channel.id, None)
+        refresh_live_tables(guild_id, PRIORITY_URGENT)
+        await ctx.send(f"Live boss timer switched to the {table_format} format.")
+        return
     try:
-        table_text = await boss_timer.generate_boss_table()
-        message = await ctx.send(table_text)
-
-        boss_timer.live_messages[ctx.channel.id] = message.id
-        await ctx.send("Live boss timer started! This message will update every 5 seconds.")
+        state = await boss_timer.get_guild(guild_key(ctx))
+        table = boss_timer.render_live_table(state, table_format)
+        message = await ctx.send(boss_timer.format_table_message(state, table))
+
+        await db.execute(INSERT_LIVE_MESSAGE_SQL,
+                         (ctx.channel.id, state.guild_id, message.id, table_format))
+        attach_live_message(ctx.channel.id, state.guild_id,
+                            ctx.channel.get_partial_message(message.id), table_format)
+        boss_timer.live_hashes[ctx.channel.id] = hash(table)
+        await ctx.send("Live boss timer started! This message will update as the timers change.")
     except Exception as e:
         await ctx.send(f"Error starting live boss timer: {e}")
 
@@ -435,30 +2546,36 @@ async def live_bosses(ctx):
 async def stop_live(ctx):
     """Stop live updating boss timer table in this channel"""
     if ctx.channel.id in boss_timer.live_messages:
-        del boss_timer.live_messages[ctx.channel.id]
+        await stop_live_message(ctx.channel.id)
         await ctx.send("Live boss timer stopped.")
     else:
         await ctx.send("No live timer is running in this channel.")
 
 
+def duplicate_kill_message(state: GuildState, boss_name: str) -> str:
+    """Reply to a kill report that was merged into an earlier one"""
+    time_left = boss_timer.format_time_left(state.next_spawns[boss_name])
+    return f"{boss_name} was already reported dead moments ago. Next spawn in {time_left}."
+
+
 @bot.command(name='dead')
 async def boss_dead(ctx, *, boss_name: str):
     """Mark a boss as dead (uses current time)"""
     # Use our flexible boss name finder
     actual_boss_name = boss_timer.find_boss_name(boss_name)
     if not actual_boss_name:
-        await ctx.send(f"Boss '{boss_name}' not found.")
+        await ctx.send(boss_timer.boss_not_found_message(boss_name))
         return
 
-    kill_time = datetime.now(boss_timer.timezone)
+    state = await boss_timer.get_guild(guild_key(ctx))
+    kill_time = datetime.now(state.timezone)
     next_spawn = boss_timer.calculate_next_spawn(actual_boss_name, kill_time)
 
-    async with aiosqlite.connect('boss_timer.db') as db:
-        await db.execute(
-            "INSERT INTO boss_kills (boss_name, kill_time, next_spawn) VALUES (?, ?, ?)",
-            (actual_boss_name, kill_time.isoformat(), next_spawn.isoformat())
-        )
-        await db.commit()
+    if not await boss_timer.record_kill(state, actual_boss_name, kill_time, next_spawn,
+                                        DEAD_DEDUP_SECONDS):
+        await ctx.send(duplicate_kill_message(state, actual_boss_name))
+        return
+    spawn_changed(state, actual_boss_name, next_spawn)
 
     time_left = boss_timer.format_time_left(next_spawn)
     await ctx.send(f"{actual_boss_name} has been marked as dead at {kill_time.strftime('%H:%M')}. Next spawn in {time_left}.")
@@ -470,12 +2587,13 @@ async def boss_died_at(ctx, boss_name: str, death_time: str):
     # Use our flexible boss name finder
     actual_boss_name = boss_timer.find_boss_name(boss_name)
     if not actual_boss_name:
-        await ctx.send(f"Boss '{boss_name}' not found.")
+        await ctx.send(boss_timer.boss_not_found_message(boss_name))
         return
 
+    state = await boss_timer.get_guild(guild_key(ctx))
     try:
         hour, minute = map(int, death_time.split(':'))
-        now = datetime.now(boss_timer.timezone)
+        now = datetime.now(state.timezone)
         kill_time = now.replace(hour=hour, minute=minute,
                                 second=0, microsecond=0)
 
@@ -488,12 +2606,10 @@ async def boss_died_at(ctx, boss_name: str, death_time: str):
 
     next_spawn = boss_timer.calculate_next_spawn(actual_boss_name, kill_time)
 
-    async with aiosqlite.connect('boss_timer.db') as db:
-        await db.execute(
-            "INSERT INTO boss_kills (boss_name, kill_time, next_spawn) VALUES (?, ?, ?)",
-            (actual_boss_name, kill_time.isoformat(), next_spawn.isoformat())
-        )
-        await db.commit()
+    if not await boss_timer.record_kill(state, actual_boss_name, kill_time, next_spawn):
+        await ctx.send(duplicate_kill_message(state, actual_boss_name))
+        return
+    spawn_changed(state, actual_boss_name, next_spawn)
 
     time_left = boss_timer.format_time_left(next_spawn)
     await ctx.send(f"{actual_boss_name} has been marked as dead at {kill_time.strftime('%H:%M')}. Next spawn in {time_left}.")
@@ -505,38 +2621,203 @@ async def set_boss_timer(ctx, boss_name: str, hours: int):
     # Use our flexible boss name finder
     actual_boss_name = boss_timer.find_boss_name(boss_name)
     if not actual_boss_name:
-        await ctx.send(f"Boss '{boss_name}' not found.")
+        await ctx.send(boss_timer.boss_not_found_message(boss_name))
         return
 
-    kill_time = datetime.now(boss_timer.timezone) - timedelta(hours=hours)
-    next_spawn = datetime.now(boss_timer.timezone) + timedelta(hours=hours)
+    state = await boss_timer.get_guild(guild_key(ctx))
+    kill_time = datetime.now(state.timezone) - timedelta(hours=hours)
+    next_spawn = datetime.now(state.timezone) + timedelta(hours=hours)
 
-    async with aiosqlite.connect('boss_timer.db') as db:
-        await db.execute(
-            "INSERT INTO boss_kills (boss_name, kill_time, next_spawn) VALUES (?, ?, ?)",
-            (actual_boss_name, kill_time.isoformat(), next_spawn.isoformat())
-        )
-        await db.commit()
+    if not await boss_timer.record_kill(state, actual_boss_name, kill_time, next_spawn):
+        await ctx.send(duplicate_kill_message(state, actual_boss_name))
+        return
+    spawn_changed(state, actual_boss_name, next_spawn)
 
     time_left = boss_timer.format_time_left(next_spawn)
     await ctx.send(f"Timer for {actual_boss_name} has been set. Next spawn in {time_left}.")
 
 
+# Skipped rows listed in the !importkills reply
+IMPORT_ERRORS_SHOWN = 5
+# Largest CSV attachment !importkills reads
+IMPORT_MAX_BYTES = 1024 * 1024
+# Imported kill times must fall between 2000-01-01 UTC and now (allowing
+# for a clock that runs a little ahead)
+IMPORT_EARLIEST_KILL_TS = 946684800
+IMPORT_CLOCK_SKEW_SECONDS = 300
+
+
+def manages_guild():
+    """Check for commands that change a server's timers for everyone
+
+    Needs the Manage Server permission; a DM channel is its own server.
+    """
+    async def predicate(ctx) -> bool:
+        if ctx.guild is None:
+            return True
+        if isinstance(ctx.author, discord.Member) and ctx.author.guild_permissions.manage_guild:
+            return True
+        raise commands.MissingPermissions(["manage_guild"])
+    return commands.check(predicate)
+
+
+@bot.command(name='importkills')
+@manages_guild()
+async def import_kills(ctx):
+    """Import kill history from an attached CSV file"""
+    if not ctx.message.attachments:
+        await ctx.send("Attach a CSV file with `boss,kill_time` rows (kill_time as `YYYY-MM-DD HH:MM` or epoch seconds).")
+        return
+    attachment = ctx.message.attachments[0]
+    if attachment.size > IMPORT_MAX_BYTES:
+        await ctx.send(f"The attachment is too large; imports are limited to {IMPORT_MAX_BYTES // 1024} KiB.")
+        return
+
+    state = await boss_timer.get_guild(guild_key(ctx))
+    try:
+        text = (await attachment.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        await ctx.send("The attachment is not a UTF-8 CSV file.")
+        return
+
+    # Parsing a large export takes a while; keep it off the event loop
+    names, kills, errors = await asyncio.to_thread(boss_timer.parse_kill_csv, text, state.timezone)
+    if names:
+        moved = await boss_timer.import_kills(state, names, kills)
+        if moved:
+            if state.guild_id in boss_timer.alert_channels.values():
+                schedule_guild_alerts(state)
+            refresh_live_tables(state.guild_id, PRIORITY_URGENT)
+
+    message = f"Imported {len(names)} kills."
+    if errors:
+        message += f" Skipped {len(errors)} rows: " + "; ".join(errors[:IMPORT_ERRORS_SHOWN])
+    await ctx.send(message)
+
+
+# Forecast limits for !schedule
+MAX_FORECAST_HOURS = 7 * 24
+SCHEDULE_PAGE_SIZE = 20
+
+
+@bot.command(name='schedule')
+async def spawn_schedule(ctx, hours: int = 24, page: int = 1):
+    """List every spawn in the next hours, one page at a time"""
+    if not 1 <= hours <= MAX_FORECAST_HOURS or page < 1:
+        await ctx.send(f"Usage: `!schedule <hours 1-{MAX_FORECAST_HOURS}> [page]`")
+        return
+
+    state = await boss_timer.get_guild(guild_key(ctx))
+    now = datetime.now(state.timezone)
+    forecast = boss_timer.forecast_spawns(state, now, now + timedelta(hours=hours))
+    # One event past the page tells whether another page exists
+    first = (page - 1) * SCHEDULE_PAGE_SIZE
+    events = list(itertools.islice(forecast, first, first + SCHEDULE_PAGE_SIZE + 1))
+    if not events:
+        await ctx.send(f"No known spawns in the next {hours}h" + (" on this page." if page > 1 else "."))
+        return
+
+    lines = []
+    for spawn, boss_name, projected in events[:SCHEDULE_PAGE_SIZE]:
+        when = spawn.astimezone(state.timezone).strftime("%a %H:%M")
+        marker = "~" if projected else " "
+        lines.append(f"{marker}{when}  {boss_timer.format_time_left(spawn, now):>8}  "
+                     f"{boss_name} ({boss_timer.schedules[boss_name].short_location})")
+    footer = f"Page {page}. ~ = projected, assuming each spawn is killed right away."
+    if len(events) > SCHEDULE_PAGE_SIZE:
+        footer += f" Next page: `!schedule {hours} {page + 1}`"
+    await ctx.send(f"**Spawns in the next {hours}h**\n```\n" + "\n".join(lines) + f"\n```\n{footer}")
+
+
+@bot.command(name='alerts')
+async def spawn_alert_toggle(ctx, setting: str = "on"):
+    """Subscribe or unsubscribe this channel from spawn alerts"""
+    setting = setting.lower()
+    if setting == "on":
+        state = await boss_timer.get_guild(guild_key(ctx))
+        boss_timer.alert_channels[ctx.channel.id] = state.guild_id
+        await db.execute(INSERT_ALERT_CHANNEL_SQL, (ctx.channel.id, state.guild_id))
+        schedule_guild_alerts(state)
+        leads = ", ".join(str(lead) for lead in spawn_alerts.leads if lead)
+        await ctx.send(f"Spawn alerts enabled in this channel ({leads} min before and at spawn).")
+    elif setting == "off":
+        boss_timer.alert_channels.pop(ctx.channel.id, None)
+        await db.execute(DELETE_ALERT_CHANNEL_SQL, (ctx.channel.id,))
+        await ctx.send("Spawn alerts disabled in this channel.")
+    else:
+        await ctx.send("Usage: `!alerts on` or `!alerts off`")
+
+
+@bot.command(name='roster')
+@manages_guild()
+async def boss_roster(ctx, action: str = "show", *, boss_name: str = ""):
+    """Show or change the bosses tracked in this server"""
+    state = await boss_timer.get_guild(guild_key(ctx))
+    action = action.lower()
+
+    if action == "show":
+        await ctx.send(f"Tracked bosses ({len(state.roster)}): {', '.join(state.roster)}")
+        return
+    if action == "reset":
+        await boss_timer.set_roster(state, None)
+        refresh_live_tables(state.guild_id, PRIORITY_URGENT)
+        await ctx.send("Boss roster reset to all bosses.")
+        return
+    if action not in ("add", "remove"):
+        await ctx.send("Usage: `!roster`, `!roster add <boss_name>`, `!roster remove <boss_name>` or `!roster reset`")
+        return
+
+    actual_boss_name = boss_timer.find_boss_name(boss_name) if boss_name else None
+    if not actual_boss_name:
+        await ctx.send(boss_timer.boss_not_found_message(boss_name))
+        return
+
+    roster = list(state.roster)
+    if action == "add" and actual_boss_name not in roster:
+        roster.append(actual_boss_name)
+    elif action == "remove" and actual_boss_name in roster:
+        roster.remove(actual_boss_name)
+    await boss_timer.set_roster(state, roster)
+    refresh_live_tables(state.guild_id, PRIORITY_URGENT)
+    verb = "added to" if action == "add" else "removed from"
+    await ctx.send(f"{actual_boss_name} {verb} this server's boss roster.")
+
+
 @bot.command(name='timezone')
+@manages_guild()
 async def set_timezone(ctx, timezone_str: str):
-    """Set the timezone for the bot (requires restart)"""
+    """Set the timezone for this server"""
     try:
         new_timezone = pytz.timezone(timezone_str)
-        boss_timer.timezone = new_timezone
-        await ctx.send(f"Timezone set to {timezone_str}. This change will take effect after restart.")
     except pytz.UnknownTimeZoneError:
         await ctx.send("Unknown timezone. Please use a valid timezone from the IANA Time Zone Database (e.g., 'Asia/Manila', 'America/New_York').")
+        return
+
+    state = await boss_timer.get_guild(guild_key(ctx))
+    await boss_timer.set_timezone(state, new_timezone)
+    refresh_live_tables(state.guild_id, PRIORITY_URGENT)
+    await ctx.send(f"Timezone set to {timezone_str} for this server.")
+
+
+@bot.command(name='reload')
+@commands.is_owner()
+async def reload_bosses(ctx):
+    """Reload the boss roster file"""
+    try:
+        added, removed, changed = await reload_roster()
+    except (OSError, ValueError) as e:
+        await ctx.send(f"Boss roster not reloaded: {e}")
+        return
+    summary = ", ".join(f"{len(names)} {label}" for names, label in
+                        ((added, "added"), (removed, "removed"), (changed, "changed")))
+    await ctx.send(f"Boss roster reloaded: {len(boss_timer.schedules)} bosses ({summary}).")
 
 
 @bot.command(name='currenttime')
 async def current_time(ctx):
-    """Show the current time according to the bot's timezone"""
-    current_time = datetime.now(boss_timer.timezone)
+    """Show the current time according to this server's timezone"""
+    state = await boss_timer.get_guild(guild_key(ctx))
+    current_time = datetime.now(state.timezone)
     await ctx.send(f"Current bot time: {current_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
 
@@ -547,14 +2828,19 @@ async def bot_help(ctx):
 **Boss Timer Bot Commands:**
 
 `!boss <boss_name>` - Get detailed information about a specific boss
-`!bosslist` - Display the current boss timer table
-`!livebosses` - Start live updating boss timer table in this channel
+`!bosslist [table|compact|embed]` - Display the current boss timer table
+`!livebosses [table|compact]` - Start live updating boss timer table in this channel
 `!stoplive` - Stop live updating boss timer table in this channel
 `!dead <boss_name>` - Mark a boss as dead (uses current time)
 `!diedat <boss_name> <HH:MM>` - Mark a boss as dead at a specific time
 `!setboss <boss_name> <hours>` - Manually set a boss timer
-`!timezone <timezone>` - Set the timezone for the bot (requires restart)
-`!currenttime` - Show the current time according to the bot's timezone
+`!importkills` - Import kill history from an attached CSV file (`boss,kill_time` rows; needs Manage Server)
+`!schedule [hours] [page]` - List every spawn in the next hours (default 24)
+`!alerts <on|off>` - Get spawn alerts in this channel
+`!roster [add|remove|reset] [boss_name]` - Show or change the bosses tracked in this server (needs Manage Server)
+`!timezone <timezone>` - Set the timezone for this server (needs Manage Server)
+`!reload` - Reload the boss roster file (bot owner only)
+`!currenttime` - Show the current time according to this server's timezone
 `!help` - Show this help message
 
 **Examples:**
@@ -563,6 +2849,9 @@ async def bot_help(ctx):
 `!diedat Viorent 11:00` - Marks Viorent as dead at 11:00
 `!setboss Venatus 5` - Sets Venatus timer to 5 hours
 `!livebosses` - Starts a live-updating boss table
+`!bosslist compact` - Shows only boss names and time left
+`!alerts on` - Announces upcoming spawns in this channel
+`!roster remove Milavy` - Hides Milavy from this server's tables
 `!timezone Asia/Manila` - Sets the timezone to Manila time
 
 **Note:** Boss names are now case-insensitive and space-insensitive. For Lady Dalia, you can use:
@@ -570,32 +2859,118 @@ async def bot_help(ctx):
 - `!boss ladydalia` 
 - `!boss dalia`
 - `!boss LadyDalia`
+
+Unique abbreviations and small typos work too (e.g. `!dead ven`, `!boss clemntis`).
 """
     await ctx.send(help_text)
 
-# Run the bot
-if __name__ == "__main__":
-    token = os.environ.get("DISCORD_BOT_TOKEN")
-    if not token:
-        print("Error: DISCORD_BOT_TOKEN environment variable not set.")
-    else:
-        bot.run(token)
+# Health and metrics endpoints, served from the bot's own event loop
+HEALTH_HOST = os.environ.get("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.environ.get("PORT", "500"))
+# /healthz fails once the event loop falls this far behind
+MAX_LOOP_LAG_SECONDS = 2.0
 
 
-app = Flask('')
+async def handle_healthz(request: web.Request) -> web.Response:
+    """Liveness: the event loop is answering without falling behind"""
+    if LOOP_LAG.value > MAX_LOOP_LAG_SECONDS:
+        return web.Response(status=503, text=f"event loop lagging {LOOP_LAG.value:.3f}s")
+    return web.Response(text="Bot is alive!")
 
 
-@app.route('/')
-def home():
-    return "Bot is alive!"
+async def handle_readyz(request: web.Request) -> web.Response:
+    """Readiness: connected to Discord with the database open"""
+    if not bot.is_ready() or not db.is_open:
+        return web.Response(status=503, text="not ready")
+    return web.Response(text="ready")
 
 
-def run():
-    app.run(host='0.0.0.0', port=500)
+def discord_latency() -> float:
+    latency = bot.latency
+    return latency if math.isfinite(latency) else -1
 
 
-# Run Flask in another thread alongside the Discord bot
-t = Thread(target=run)
-t.start()
+def guild_cache_hit_ratio() -> float:
+    lookups = boss_timer.guild_cache_hits + boss_timer.guild_cache_misses
+    return boss_timer.guild_cache_hits / lookups if lookups else 0
 
 
+metrics.callback("gauge", "boss_timer_uptime_seconds", "Seconds since startup",
+                 lambda: time.monotonic() - STARTED)
+metrics.callback("gauge", "boss_timer_discord_latency_seconds",
+                 "Gateway heartbeat latency (-1 when unknown)", discord_latency)
+metrics.callback("gauge", "boss_timer_live_channels", "Channels with a live table",
+                 lambda: len(boss_timer.live_messages))
+metrics.callback("gauge", "boss_timer_alert_channels", "Channels subscribed to spawn alerts",
+                 lambda: len(boss_timer.alert_channels))
+metrics.callback("gauge", "boss_timer_guilds_loaded", "Guild states held in memory",
+                 lambda: len(boss_timer.guilds))
+metrics.callback("counter", "boss_timer_guild_cache_hits_total", "Guild state cache hits",
+                 lambda: boss_timer.guild_cache_hits)
+metrics.callback("counter", "boss_timer_guild_cache_misses_total", "Guild state cache misses",
+                 lambda: boss_timer.guild_cache_misses)
+metrics.callback("gauge", "boss_timer_guild_cache_hit_ratio", "Guild state cache hit ratio",
+                 guild_cache_hit_ratio)
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Prometheus text exposition of every registered metric"""
+    return web.Response(text=metrics.render())
+
+
+async def start_health_server() -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/", handle_healthz)
+    app.router.add_get("/healthz", handle_healthz)
+    app.router.add_get("/readyz", handle_readyz)
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HEALTH_HOST, HEALTH_PORT).start()
+    return runner
+
+
+async def run_bot(token: str):
+    """Run the bot and the health server on one event loop"""
+    async with bot:
+        runner = await start_health_server()
+        try:
+            await bot.start(token)
+        finally:
+            await runner.cleanup()
+
+
+async def import_kills_file(path: str, guild_id: int) -> Tuple[int, List[str]]:
+    """Import a CSV kill export into a guild without starting the bot"""
+    await init_db()
+    try:
+        state = await boss_timer.get_guild(guild_id)
+        with open(path, encoding="utf-8-sig") as export:
+            names, kills, errors = boss_timer.parse_kill_csv(export.read(), state.timezone)
+        if names:
+            await boss_timer.import_kills(state, names, kills)
+        return len(names), errors
+    finally:
+        await db.close()
+
+
+# Run the bot
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["importkills"]:
+        if len(sys.argv) != 4:
+            sys.exit("Usage: python main.py importkills <file.csv> <guild_id>")
+        imported, errors = asyncio.run(import_kills_file(sys.argv[2], int(sys.argv[3])))
+        for error in errors:
+            print(error)
+        print(f"Imported {imported} kills, skipped {len(errors)} rows.")
+        sys.exit()
+
+    token = os.environ.get("DISCORD_BOT_TOKEN")
+    if not token:
+        print("Error: DISCORD_BOT_TOKEN environment variable not set.")
+    else:
+        discord.utils.setup_logging()
+        try:
+            asyncio.run(run_bot(token))
+        except KeyboardInterrupt:
+            pass
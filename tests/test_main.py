@@ -0,0 +1,178 @@
+"""Tests for the boss timer bot.
+
+    python -m pytest
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime
+
+import pytest
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+# Rows as the bot wrote them before migrations: ISO times, no guild
+BASELINE_KILLS = [
+    ("Venatus", "2026-09-01T10:00:00+08:00", "2026-09-01T20:00:00+08:00"),
+    ("Ego", "2026-09-01T12:15:00+08:00", "2026-09-02T09:15:00+08:00"),
+    ("Venatus", "2026-09-02T11:30:15.250000+08:00", "2026-09-02T21:30:15.250000+08:00"),
+]
+TIMEZONES = ["Asia/Manila", "UTC", "America/New_York", "Europe/London", "Australia/Lord_Howe"]
+
+
+def epoch(iso: str) -> int:
+    return int(datetime.fromisoformat(iso).timestamp())
+
+
+def create_baseline_db(path: str):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS boss_kills (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            boss_name TEXT NOT NULL,
+            kill_time DATETIME NOT NULL,
+            next_spawn DATETIME
+        )
+    ''')
+    conn.executemany("INSERT INTO boss_kills (boss_name, kill_time, next_spawn) VALUES (?, ?, ?)",
+                     BASELINE_KILLS)
+    conn.commit()
+    conn.close()
+
+
+def test_baseline_db_migrates(tmp_path, monkeypatch):
+    path = str(tmp_path / "boss_timer.db")
+    create_baseline_db(path)
+    monkeypatch.setattr(main, "DEFAULT_GUILD_ID", 42)
+    monkeypatch.setattr(main, "db", main.Database(path))
+
+    async def migrate():
+        try:
+            await main.init_db()
+            # Running again on a current database changes nothing
+            await main.migrate_db()
+            version = (await main.db.fetchone("PRAGMA user_version"))[0]
+            kills = await main.db.fetchall(
+                "SELECT id, guild_id, boss_name, kill_ts, spawn_ts FROM boss_kills ORDER BY id")
+            state_before = await main.db.fetchall(main.SELECT_BOSS_STATE_SQL, (42,))
+            await main.db.execute(main.INSERT_KILL_SQL, (42, "Venatus", 1_790_000_000, 1_790_036_000))
+            state_after = await main.db.fetchall(main.SELECT_BOSS_STATE_SQL, (42,))
+            return version, kills, state_before, state_after
+        finally:
+            await main.db.close()
+
+    version, kills, state_before, state_after = asyncio.run(migrate())
+
+    assert version == len(main.MIGRATIONS)
+    assert [tuple(row) for row in kills] == [
+        (i, 42, name, epoch(kill_time), epoch(next_spawn))
+        for i, (name, kill_time, next_spawn) in enumerate(BASELINE_KILLS, start=1)
+    ]
+    # The backfill keeps the latest kill of each boss
+    assert sorted(tuple(row) for row in state_before) == [
+        ("Ego", 2, epoch(BASELINE_KILLS[1][1]), epoch(BASELINE_KILLS[1][2])),
+        ("Venatus", 3, epoch(BASELINE_KILLS[2][1]), epoch(BASELINE_KILLS[2][2])),
+    ]
+    # and the trigger keeps it current
+    assert sorted(tuple(row) for row in state_after) == [
+        ("Ego", 2, epoch(BASELINE_KILLS[1][1]), epoch(BASELINE_KILLS[1][2])),
+        ("Venatus", 4, 1_790_000_000, 1_790_036_000),
+    ]
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("zone", TIMEZONES)
+def test_bulk_spawns_match_single(zone, use_numpy, monkeypatch):
+    if use_numpy and main.numpy is None:
+        pytest.skip("numpy is not installed")
+    if not use_numpy:
+        monkeypatch.setattr(main, "numpy", None)
+    timer = main.boss_timer
+    timezone = pytz.timezone(zone)
+    rng = random.Random(zone)
+    names = list(timer.schedules)
+    start = int(datetime(2026, 1, 1, tzinfo=pytz.utc).timestamp())
+    # A year of kills crosses both DST transitions where there are any
+    kill_names = [rng.choice(names) for _ in range(3000)]
+    kills = [start + rng.randrange(365 * 86400) for _ in range(3000)]
+    # Kills right on a weekly slot, and seconds into it, are the edge cases
+    for name, kill_ts in list(zip(kill_names, kills))[:500]:
+        spawn = timer.calculate_next_spawn(name, datetime.fromtimestamp(kill_ts, timezone))
+        kill_names += [name, name]
+        kills += [int(spawn.timestamp()), int(spawn.timestamp()) + 30]
+
+    expected = [int(timer.calculate_next_spawn(name, datetime.fromtimestamp(kill_ts, timezone)).timestamp())
+                for name, kill_ts in zip(kill_names, kills)]
+    assert timer.calculate_next_spawns(kill_names, kills, timezone) == expected
+
+
+def test_import_skips_kills_outside_range():
+    timezone = pytz.timezone("Asia/Manila")
+    text = "\n".join([
+        "boss,kill_time",
+        "Venatus,99999999999999",
+        "Venatus,0",
+        "Venatus,9999-12-31 23:59",
+        "Venatus,1999-12-31 23:59",
+        "Venatus,2026-09-01 10:00",
+        f"Ego,{int(datetime.now(pytz.utc).timestamp())}",
+    ])
+    names, kills, errors = main.boss_timer.parse_kill_csv(text, timezone)
+    assert names == ["Venatus", "Ego"]
+    assert kills[0] == epoch("2026-09-01T10:00:00+08:00")
+    assert [error.split(":")[0] for error in errors] == ["line 2", "line 3", "line 4", "line 5"]
+
+
+def test_boss_rows_show_now_at_the_spawn_second(monkeypatch):
+    timezone = pytz.timezone("Asia/Manila")
+    frozen = timezone.localize(datetime(2026, 9, 1, 12, 2, 30))
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return frozen.astimezone(tz)
+
+    monkeypatch.setattr(main, "datetime", FrozenDatetime)
+    state = main.GuildState(1, timezone, ("Venatus", "Ego", "Livera"), {
+        "Venatus": timezone.localize(datetime(2026, 9, 1, 12, 2, 10)),
+        "Ego": timezone.localize(datetime(2026, 9, 1, 12, 5, 45)),
+    })
+    # Countdowns run from the start of the minute; NOW! from the exact time
+    assert main.boss_timer.boss_rows(state) == [("Venatus", "NOW!"), ("Ego", "00:03"), ("Livera", "TBD")]
+
+
+def test_live_tick_survives_errors(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main, "refresh_live_tables", fail)
+    errors = main.TICK_ERRORS.value
+    asyncio.run(main.update_boss_timers.coro())
+    assert main.TICK_ERRORS.value == errors + 1
+
+
+def test_dm_keys_belong_to_shard_zero(monkeypatch):
+    monkeypatch.setattr(main.bot, "shard_count", 2)
+    dm_channel = (7 << 22) | 1  # the formula would put it on shard 1
+    guild = 6 << 22
+    monkeypatch.setattr(main.bot, "shard_ids", [0])
+    assert main.owns_guild(dm_channel, dm_channel)
+    assert main.owns_guild(guild, 123)
+    monkeypatch.setattr(main.bot, "shard_ids", [1])
+    assert not main.owns_guild(dm_channel, dm_channel)
+    assert not main.owns_guild(guild, 123)
+
+
+@pytest.mark.parametrize("text, match", [
+    ("venatus", "Venatus"), ("vena", "Venatus"), ("venatsu", "Venatus"), ("venatus2", "Venatus"),
+    ("vego", None), ("diego", None), ("amego", None), ("egor", None), ("xbaron", None),
+])
+def test_resolver_needs_most_of_the_input(text, match):
+    found, suggestions = main.boss_timer.resolver.resolve(text)
+    assert found == match
+    assert suggestions